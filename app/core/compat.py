@@ -0,0 +1,13 @@
+import sys
+
+
+def ensure_importlib_metadata():
+    """
+    google-generativeai needs `importlib.metadata.packages_distributions`,
+    which only exists from Python 3.10. Patch it from the backport on
+    older interpreters. Must run before google.generativeai is imported.
+    """
+    if sys.version_info < (3, 10):
+        import importlib_metadata
+        import importlib.metadata
+        importlib.metadata.packages_distributions = importlib_metadata.packages_distributions
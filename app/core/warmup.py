@@ -0,0 +1,65 @@
+import importlib
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.core.compat import ensure_importlib_metadata
+
+logger = logging.getLogger(__name__)
+
+# Heavy modules that request handlers import on first use
+HEAVY_MODULES = (
+    "google.generativeai",
+    "google.api_core.exceptions",
+    "json_repair",
+    "numpy",
+    "PIL.Image",
+    "PIL.ImageEnhance",
+    "pypdf",
+    "httpx",
+)
+
+
+class WarmupState:
+    """Tracks background pre-loading of heavy dependencies."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._finished_at is not None and self._error is None
+
+    def run(self):
+        """Import every heavy module. Safe to call more than once."""
+        with self._lock:
+            if self._finished_at is not None:
+                return
+            self._started_at = time.perf_counter()
+            try:
+                ensure_importlib_metadata()
+                for name in HEAVY_MODULES:
+                    importlib.import_module(name)
+            except Exception as e:
+                logger.error(f"Warm-up failed: {e}")
+                self._error = str(e)
+            self._finished_at = time.perf_counter()
+            logger.info(f"Warm-up finished in {self._finished_at - self._started_at:.2f}s")
+
+    def status(self) -> Dict[str, Any]:
+        duration = None
+        if self._started_at is not None and self._finished_at is not None:
+            duration = round(self._finished_at - self._started_at, 3)
+        return {
+            "ready": self.ready,
+            "warmup_seconds": duration,
+            "error": self._error,
+        }
+
+
+# Global instance
+warmup_state = WarmupState()
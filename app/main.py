@@ -1,26 +1,89 @@
-import sys
-if sys.version_info < (3, 10):
-    import importlib_metadata
-    import importlib.metadata
-    importlib.metadata.packages_distributions = importlib_metadata.packages_distributions
-
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body
-from app.models.schemas import BillExtractionResponse, BillExtractionRequest
-from app.services.llm import extract_with_llm
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.models.schemas import BillExtractionResponse, BillExtractionRequest, ResultQueryResponse
+from app.services.llm import extract_with_llm, iter_extraction
 from app.utils.download import download_file
-from app.utils.image_processing import enhance_image
+from app.utils.image_processing import enhance_image_async, shutdown_image_pool
 from app.services.cache import response_cache
+from app.services.store import result_store, content_digest
+from app.core.warmup import warmup_state
 from dotenv import load_dotenv
-import uuid
 
-load_dotenv()
 
-app = FastAPI(title="Bill Extraction API", version="0.1.0", debug=True)
+async def compact_store_periodically(interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(result_store.compact)
+        except Exception as e:
+            logger.error(f"Result store compaction failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    load_dotenv()
+    # Pre-load heavy dependencies in a worker thread so startup does not
+    # wait for them; the first request imports whatever is still missing.
+    warmup_task = asyncio.create_task(asyncio.to_thread(warmup_state.run))
+    compaction_task = asyncio.create_task(
+        compact_store_periodically(float(os.environ.get("RESULT_STORE_COMPACT_INTERVAL", 3600)))
+    )
+    yield
+    compaction_task.cancel()
+    await warmup_task
+    result_store.close()
+    shutdown_image_pool()
+
+
+def save_result(digest: str, data, token_usage, source: Optional[str]):
+    """
+    Persist a result; a storage failure must not fail the extraction.
+    Partial results (pages missed the deadline) are not stored, like they
+    are not cached, so lookups never return an incomplete bill.
+    Blocking (SQLite, and waits out a running compaction): call it from a
+    worker thread, never directly on the event loop.
+    """
+    if data.get("is_partial"):
+        return
+    try:
+        result_store.save(digest, data, token_usage, source=source)
+    except Exception as e:
+        logger.error(f"Failed to store result: {e}")
+
+
+app = FastAPI(title="Bill Extraction API", version="0.1.0", debug=True, lifespan=lifespan)
 
 @app.get("/")
 def read_root():
     return {"message": "Bill Extraction API is running"}
 
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 200 once heavy dependencies are loaded, 503 before."""
+    status = warmup_state.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/results", response_model=ResultQueryResponse)
+def query_results(
+    bill_no: Optional[str] = None,
+    patient: Optional[str] = Query(None, description="Case-insensitive patient name prefix"),
+    date_from: Optional[str] = Query(None, description="Earliest bill date (inclusive)"),
+    date_to: Optional[str] = Query(None, description="Latest bill date (inclusive)"),
+    digest: Optional[str] = Query(None, description="SHA-256 of the document bytes"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Look up previously extracted bills without calling Gemini again."""
+    results = result_store.query(
+        bill_no=bill_no, patient=patient, date_from=date_from, date_to=date_to, digest=digest, limit=limit
+    )
+    return ResultQueryResponse(results=results)
+
 import logging
 import traceback
 
@@ -47,24 +110,30 @@ async def extract_bill(request: BillExtractionRequest):
         logger.info("Downloading file...")
         file_content, mime_type = await download_file(request.document)
         logger.info(f"File downloaded. Mime type: {mime_type}")
+        digest = content_digest(file_content)
         
         # Pre-processing: Enhance image if it's an image type
         if mime_type.startswith("image/"):
-            file_content = enhance_image(file_content)
+            file_content = await enhance_image_async(file_content)
         
         # Extraction using Gemini Vision
         logger.info("Calling Gemini Vision...")
-        extraction_data, token_usage = extract_with_llm(file_content, mime_type)
+        # Blocking (Gemini calls, hedge waits, retry backoff): keep it off the event loop
+        extraction_data, token_usage = await asyncio.to_thread(
+            extract_with_llm, file_content, mime_type, request.deadline_seconds
+        )
         
         if not extraction_data:
             raise HTTPException(status_code=500, detail="Failed to extract data using Gemini")
         
-        # 2. Store in Cache
+        # 2. Store in Cache (partial results are retried on the next request)
         cache_payload = {
             "data": extraction_data,
             "token_usage": token_usage
         }
-        response_cache.set(request.document, cache_payload)
+        if not extraction_data.get("is_partial"):
+            response_cache.set(request.document, cache_payload)
+        await asyncio.to_thread(save_result, digest, extraction_data, token_usage, request.document)
 
         return BillExtractionResponse(
             is_success=True,
@@ -78,19 +147,22 @@ async def extract_bill(request: BillExtractionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/extract-from-file", response_model=BillExtractionResponse)
-async def extract_bill_file(file: UploadFile = File(...)):
+async def extract_bill_file(file: UploadFile = File(...), deadline_seconds: Optional[float] = Query(None, gt=0)):
     try:
         content = await file.read()
         mime_type = file.content_type
+        digest = content_digest(content)
         
         # Pre-processing: Enhance image
         if mime_type.startswith("image/"):
-            content = enhance_image(content)
+            content = await enhance_image_async(content)
         
-        extraction_data, token_usage = extract_with_llm(content, mime_type)
+        extraction_data, token_usage = await asyncio.to_thread(extract_with_llm, content, mime_type, deadline_seconds)
         
         if not extraction_data:
              raise HTTPException(status_code=500, detail="Failed to extract data using Gemini")
+        
+        await asyncio.to_thread(save_result, digest, extraction_data, token_usage, file.filename)
              
         return BillExtractionResponse(
             is_success=True,
@@ -99,3 +171,76 @@ async def extract_bill_file(file: UploadFile = File(...)):
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def ndjson_stream(events):
+    for event in events:
+        yield json.dumps(event) + "\n"
+
+
+def extraction_events(content: bytes, mime_type: str, deadline_seconds: Optional[float], digest: str,
+                      source: Optional[str], cache_key: Optional[str] = None):
+    """
+    Progress events for the streaming endpoints. The final `done` event
+    carries the non-streaming response fields; its data additionally keeps
+    `metadata`, `category_summary` and each item's `item_category` so
+    clients can aggregate without another request.
+    """
+    try:
+        token_usage, extraction_data = None, None
+        for event in iter_extraction(content, mime_type, deadline_seconds):
+            if event["event"] != "done":
+                yield event
+                continue
+            extraction_data, token_usage = event["data"], event["token_usage"]
+
+        if not extraction_data:
+            yield {"event": "error", "detail": "Failed to extract data using Gemini"}
+            return
+
+        if cache_key and not extraction_data.get("is_partial"):
+            response_cache.set(cache_key, {"data": extraction_data, "token_usage": token_usage})
+        save_result(digest, extraction_data, token_usage, source=source)
+
+        # Validate against the response schema before sending
+        BillExtractionResponse(is_success=True, token_usage=token_usage, data=extraction_data)
+        yield {"event": "done", "is_success": True, "token_usage": token_usage, "data": extraction_data}
+    except Exception as e:
+        logger.error(f"Error streaming extraction: {str(e)}")
+        logger.error(traceback.format_exc())
+        yield {"event": "error", "detail": str(e)}
+
+
+@app.post("/extract-bill-data/stream")
+async def extract_bill_stream(request: BillExtractionRequest):
+    """Same as /extract-bill-data, streamed as NDJSON events while pages complete."""
+    cached_result = response_cache.get(request.document)
+    if cached_result:
+        done = {"event": "done", "is_success": True, **cached_result}
+        return StreamingResponse(ndjson_stream([done]), media_type="application/x-ndjson")
+
+    try:
+        file_content, mime_type = await download_file(request.document)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    digest = content_digest(file_content)
+    if mime_type.startswith("image/"):
+        file_content = await enhance_image_async(file_content)
+
+    events = extraction_events(
+        file_content, mime_type, request.deadline_seconds, digest, request.document, cache_key=request.document
+    )
+    return StreamingResponse(ndjson_stream(events), media_type="application/x-ndjson")
+
+
+@app.post("/extract-from-file/stream")
+async def extract_bill_file_stream(file: UploadFile = File(...), deadline_seconds: Optional[float] = Query(None, gt=0)):
+    """Same as /extract-from-file, streamed as NDJSON events while pages complete."""
+    content = await file.read()
+    mime_type = file.content_type
+    digest = content_digest(content)
+    if mime_type.startswith("image/"):
+        content = await enhance_image_async(content)
+
+    events = extraction_events(content, mime_type, deadline_seconds, digest, file.filename)
+    return StreamingResponse(ndjson_stream(events), media_type="application/x-ndjson")
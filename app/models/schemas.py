@@ -16,9 +16,36 @@ class PageLineItems(BaseModel):
 
 
 
+class LineItemAnomaly(BaseModel):
+    kind: str = Field(..., description="amount_mismatch | category_total_mismatch | net_amount_mismatch | duplicate_row")
+    message: str = Field(..., description="Human readable explanation")
+    item_indices: List[int] = Field(default_factory=list, description="Positions of the affected items in bill_items")
+    expected: Optional[float] = Field(None, description="Value printed on the bill, if applicable")
+    actual: Optional[float] = Field(None, description="Value computed from the line items, if applicable")
+
+
+class MergeDecision(BaseModel):
+    item_name: str
+    item_amount: float
+    page_no: str = Field(..., description="Page the dropped row was read from")
+    duplicate_of_page: str = Field(..., description="Page holding the row that was kept")
+    reason: str = Field(..., description="page_boundary | repeated_block")
+
+
+class MergeReport(BaseModel):
+    duplicates_removed: int = Field(0, ge=0)
+    amount_removed: float = Field(0.0, description="Sum of the dropped item amounts")
+    decisions: List[MergeDecision] = Field(default_factory=list)
+
+
 class ExtractionData(BaseModel):
     pagewise_line_items: List[PageLineItems]
     total_item_count: int = Field(..., ge=0)
+    reconciled_amount: float = Field(0.0, description="Sum of item amounts")
+    anomalies: List[LineItemAnomaly] = Field(default_factory=list, description="Validation flags raised while merging")
+    merge_report: MergeReport = Field(default_factory=MergeReport, description="Cross-page duplicates removed while merging")
+    is_partial: bool = Field(False, description="True if some pages could not be read before the deadline or failed")
+    missing_pages: List[str] = Field(default_factory=list, description="Page numbers whose items are missing")
 
 
 class TokenUsage(BaseModel):
@@ -35,3 +62,22 @@ class BillExtractionResponse(BaseModel):
 
 class BillExtractionRequest(BaseModel):
     document: str = Field(..., description="URL of the document to extract")
+    deadline_seconds: Optional[float] = Field(None, gt=0, description="Time budget for all Gemini calls (default EXTRACTION_DEADLINE_SECONDS, none if unset)")
+
+
+class StoredResult(BaseModel):
+    id: int
+    digest: str = Field(..., description="SHA-256 of the original document bytes")
+    source: Optional[str] = Field(None, description="Document URL or uploaded file name")
+    bill_no: Optional[str] = None
+    patient_name: Optional[str] = None
+    admission_date: Optional[str] = Field(None, description="ISO date, if it could be parsed")
+    discharge_date: Optional[str] = Field(None, description="ISO date, if it could be parsed")
+    net_amount: Optional[float] = None
+    created_at: float = Field(..., description="Unix timestamp of the extraction")
+    token_usage: Optional[TokenUsage] = None
+    data: ExtractionData
+
+
+class ResultQueryResponse(BaseModel):
+    results: List[StoredResult]
@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Latency samples kept per model for the hedge percentile
+LATENCY_WINDOW = 200
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class DeadlineExceededError(TimeoutError):
+    """The request deadline passed before the call could complete."""
+
+
+class Deadline:
+    """Absolute point in time shared by every call made for one request."""
+
+    def __init__(self, seconds: Optional[float]):
+        self._expires_at = time.monotonic() + seconds if seconds else None
+
+    @classmethod
+    def none(cls) -> "Deadline":
+        return cls(None)
+
+    @property
+    def unbounded(self) -> bool:
+        return self._expires_at is None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None if there is no deadline."""
+        if self._expires_at is None:
+            return None
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self._expires_at is not None and time.monotonic() >= self._expires_at
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceededError("Request deadline exceeded")
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per model."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, seconds: float):
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def percentile(self, key: str, pct: float, min_samples: int = 1) -> Optional[float]:
+        """`pct` percentile of recent latencies, None with too few samples."""
+        with self._lock:
+            samples = sorted(self._samples[key])
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(pct / 100 * len(samples)))]
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.environ.get("GEMINI_MAX_INFLIGHT", 32)), thread_name_prefix="gemini"
+            )
+        return _executor
+
+
+def hedged_call(fn: Callable[[], T], deadline: Deadline, hedge_after: Optional[float],
+                hedge_fn: Optional[Callable[[], T]] = None) -> T:
+    """
+    Run `fn` and, if it has not finished after `hedge_after` seconds, start
+    a second attempt with `hedge_fn` (default `fn`). The first successful
+    result wins; if one attempt fails the other is still awaited. The loser
+    is cancelled if it has not started and otherwise left to run out its
+    own timeout with the result discarded, keeping a shared executor
+    thread until then (`call_gemini_safe` caps the hedge's timeout at a
+    multiple of `hedge_after`). Raises DeadlineExceededError if neither
+    finishes before the deadline.
+    """
+    executor = _get_executor()
+    pending = {executor.submit(fn)}
+    if hedge_after is not None:
+        first_wait = hedge_after if deadline.unbounded else min(hedge_after, deadline.remaining())
+        done, _ = wait(pending, timeout=first_wait)
+        if not done and not deadline.expired():
+            pending.add(executor.submit(hedge_fn or fn))
+
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    loser.cancel()
+                return future.result()
+            error = future.exception()
+
+    if error is not None and not pending:
+        raise error
+    for future in pending:
+        future.cancel()
+    raise DeadlineExceededError("Request deadline exceeded")
@@ -0,0 +1,272 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# A row's amount may differ from rate x qty by rounding on the printed bill
+AMOUNT_TOLERANCE_ABS = 1.0
+AMOUNT_TOLERANCE_REL = 0.01
+
+# Identical consecutive rows repeated on a later page are treated as a
+# re-captured block only from this length on; shorter repeats are kept
+# (day-wise charges legitimately repeat).
+MIN_REPEATED_BLOCK = 3
+# A run at the top of a page repeating the bottom of the previous page is
+# a page-break overlap from this length on. A single repeated row is kept
+# (a recurring charge can straddle the break) and flagged as duplicate_row.
+MIN_BOUNDARY_OVERLAP = 2
+
+# First number in the text; currency prefixes like "Rs." are skipped
+_NUMBER = re.compile(r"-?\d[\d,]*(?:\.\d+)?")
+
+
+def _to_float(value: Any) -> float:
+    """Coerce an LLM-provided number ("1,200.00", "Rs. 50", None) to float."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value) if np.isfinite(value) else 0.0
+    if isinstance(value, str):
+        found = _NUMBER.search(value)
+        return float(found.group().replace(",", "")) if found else 0.0
+    return 0.0
+
+
+def normalize_label(value: Any) -> str:
+    """Lowercase and collapse whitespace so labels compare reliably."""
+    return " ".join(str(value or "").lower().split())
+
+
+def _within_tolerance(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    tolerance = np.maximum(AMOUNT_TOLERANCE_ABS, AMOUNT_TOLERANCE_REL * np.abs(expected))
+    return np.abs(expected - actual) <= tolerance
+
+
+class LineItemTable:
+    """
+    Column-oriented line items used while merging pages.
+    Numeric columns are NumPy arrays so validation runs vectorized;
+    rows are turned back into `BillItem` dicts only at the API edge.
+    """
+
+    __slots__ = ("names", "amounts", "rates", "quantities", "pages", "categories")
+
+    def __init__(self, names, amounts, rates, quantities, pages, categories):
+        self.names = np.asarray(names, dtype=object)
+        self.amounts = np.asarray(amounts, dtype=np.float64)
+        self.rates = np.asarray(rates, dtype=np.float64)
+        self.quantities = np.asarray(quantities, dtype=np.float64)
+        self.pages = np.asarray(pages, dtype=np.int32)
+        self.categories = np.asarray(categories, dtype=object)
+
+    @classmethod
+    def empty(cls) -> "LineItemTable":
+        return cls([], [], [], [], [], [])
+
+    @classmethod
+    def from_items(cls, items: Iterable[Dict[str, Any]], page_no: int) -> "LineItemTable":
+        """Build a table from the raw dicts returned by the LLM for one page."""
+        rows = [item for item in items if isinstance(item, dict)]
+        return cls(
+            names=[str(item.get("item_name") or "").strip() for item in rows],
+            amounts=[_to_float(item.get("item_amount")) for item in rows],
+            rates=[_to_float(item.get("item_rate")) for item in rows],
+            quantities=[_to_float(item.get("item_quantity")) for item in rows],
+            pages=[page_no] * len(rows),
+            categories=[normalize_label(item.get("category")) for item in rows],
+        )
+
+    @classmethod
+    def concat(cls, tables: List["LineItemTable"]) -> "LineItemTable":
+        if not tables:
+            return cls.empty()
+        return cls(*(np.concatenate([getattr(t, col) for t in tables]) for col in cls.__slots__))
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def take(self, indices) -> "LineItemTable":
+        """Select rows by index array or boolean mask."""
+        return LineItemTable(*(getattr(self, col)[indices] for col in self.__slots__))
+
+    def total_amount(self) -> float:
+        return float(self.amounts.sum())
+
+    def key_codes(self) -> np.ndarray:
+        """
+        Integer code per row; rows with equal normalized
+        (name, rate, qty, amount) share a code.
+        """
+        codes = np.empty(len(self), dtype=np.int64)
+        seen: Dict[tuple, int] = {}
+        rates = np.round(self.rates, 2)
+        quantities = np.round(self.quantities, 2)
+        amounts = np.round(self.amounts, 2)
+        for i, name in enumerate(self.names):
+            key = (normalize_label(name), rates[i], quantities[i], amounts[i])
+            codes[i] = seen.setdefault(key, len(seen))
+        return codes
+
+    def to_bill_items(self) -> List[Dict[str, Any]]:
+        """
+        Serialize rows to the `BillItem` schema. `item_category` is kept for
+        internal consumers (stream, dashboard) and dropped by the schema.
+        """
+        return [
+            {
+                "item_name": name,
+                "item_amount": amount,
+                "item_rate": rate,
+                "item_quantity": quantity,
+                "item_category": category,
+            }
+            for name, amount, rate, quantity, category in zip(
+                self.names.tolist(), self.amounts.tolist(), self.rates.tolist(),
+                self.quantities.tolist(), self.categories.tolist()
+            )
+        ]
+
+
+def dedupe_line_items(table: LineItemTable) -> Tuple[LineItemTable, List[Dict[str, Any]]]:
+    """
+    Drop rows captured twice because pages overlap or a table continues
+    across a page break. Rows must be grouped by page in reading order.
+
+    A row on a later page is a duplicate when it matches a row from an
+    earlier page and either
+      * it is part of a run of at least MIN_BOUNDARY_OVERLAP rows at the top
+        of its page that repeats the bottom of the previous page
+        (page-break overlap), or
+      * it is part of a run of at least MIN_REPEATED_BLOCK consecutive rows
+        repeating consecutive rows of an earlier page (overlapping scans).
+    Runs in linear time. Returns the kept rows and one decision per dropped row.
+    """
+    n = len(table)
+    if n == 0:
+        return table, []
+
+    codes = table.key_codes()
+    pages = table.pages
+    page_start = np.r_[True, pages[1:] != pages[:-1]]
+    page_end = np.r_[pages[1:] != pages[:-1], True]
+    group = np.cumsum(page_start) - 1
+
+    # Most recent occurrence of each key on an earlier page
+    match = np.full(n, -1, dtype=np.int64)
+    last_seen: Dict[int, int] = {}
+    pending: Dict[int, int] = {}
+    for i, code in enumerate(codes.tolist()):
+        if page_start[i]:
+            last_seen.update(pending)
+            pending = {}
+        match[i] = last_seen.get(code, -1)
+        pending[code] = i
+
+    # Split matched rows into runs that follow consecutive earlier rows
+    has = match >= 0
+    linked = np.zeros(n, dtype=bool)
+    linked[1:] = has[1:] & has[:-1] & ~page_start[1:] & (match[1:] == match[:-1] + 1)
+    starts = np.flatnonzero(has & ~linked)
+    run_id = np.cumsum(~linked) - 1
+    lengths = np.bincount(run_id[has], minlength=run_id[-1] + 1)[run_id[starts]]
+    ends = starts + lengths - 1
+
+    last_match = match[ends]
+    overlap = (
+        page_start[starts] & page_end[last_match] & (group[last_match] == group[starts] - 1)
+        & (lengths >= MIN_BOUNDARY_OVERLAP)
+    )
+    dropped_runs = overlap | (lengths >= MIN_REPEATED_BLOCK)
+
+    drop = np.zeros(n, dtype=bool)
+    reasons: Dict[int, str] = {}
+    for start, length, is_overlap in zip(
+        starts[dropped_runs].tolist(), lengths[dropped_runs].tolist(), overlap[dropped_runs].tolist()
+    ):
+        drop[start:start + length] = True
+        reasons[start] = "page_boundary" if is_overlap else "repeated_block"
+
+    decisions: List[Dict[str, Any]] = []
+    reason = None
+    for i in np.flatnonzero(drop).tolist():
+        reason = reasons.get(i, reason)
+        kept = int(match[i])
+        while drop[kept]:
+            kept = int(match[kept])
+        decisions.append({
+            "item_name": table.names[i],
+            "item_amount": float(table.amounts[i]),
+            "page_no": str(pages[i]),
+            "duplicate_of_page": str(pages[kept]),
+            "reason": reason,
+        })
+
+    return table.take(~drop), decisions
+
+
+def validate_line_items(
+    table: LineItemTable,
+    net_amount: Any = None,
+    category_summary: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run the bill consistency checks over the whole table at once.
+    Returns a list of anomaly dicts matching `LineItemAnomaly`.
+    """
+    anomalies: List[Dict[str, Any]] = []
+
+    # 1. rate x qty vs amount (only where both were printed)
+    priced = (table.rates > 0) & (table.quantities > 0)
+    mismatched = priced & ~_within_tolerance(table.rates * table.quantities, table.amounts)
+    if mismatched.any():
+        indices = np.flatnonzero(mismatched).tolist()
+        anomalies.append({
+            "kind": "amount_mismatch",
+            "message": f"{len(indices)} item(s) where rate x quantity does not match amount",
+            "item_indices": indices,
+        })
+
+    # 2. Per-category sums vs the summary table
+    summary = [row for row in (category_summary or []) if isinstance(row, dict)]
+    if summary and len(table):
+        lookup = {normalize_label(row.get("category")): i for i, row in enumerate(summary)}
+        codes = np.fromiter((lookup.get(c, -1) for c in table.categories), dtype=np.int64, count=len(table))
+        tagged = codes >= 0
+        sums = np.bincount(codes[tagged], weights=table.amounts[tagged], minlength=len(summary))
+        counts = np.bincount(codes[tagged], minlength=len(summary))
+        expected = np.array([_to_float(row.get("gross_amount")) for row in summary])
+        off = (counts > 0) & ~_within_tolerance(expected, sums)
+        for i in np.flatnonzero(off).tolist():
+            anomalies.append({
+                "kind": "category_total_mismatch",
+                "message": f"Items in '{summary[i].get('category')}' do not add up to the summary gross amount",
+                "item_indices": np.flatnonzero(codes == i).tolist(),
+                "expected": float(expected[i]),
+                "actual": float(sums[i]),
+            })
+
+    # 3. Net amount reconciliation
+    net = _to_float(net_amount)
+    total = table.total_amount()
+    if net > 0 and not _within_tolerance(np.array([net]), np.array([total]))[0]:
+        anomalies.append({
+            "kind": "net_amount_mismatch",
+            "message": "Sum of line items does not match the bill net amount",
+            "expected": net,
+            "actual": total,
+        })
+
+    # 4. Identical rows
+    if len(table):
+        codes = table.key_codes()
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        group_starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, len(codes)])
+        for start, size in zip(group_starts[group_sizes > 1].tolist(), group_sizes[group_sizes > 1].tolist()):
+            indices = np.sort(order[start:start + size]).tolist()
+            anomalies.append({
+                "kind": "duplicate_row",
+                "message": f"'{table.names[indices[0]]}' appears {size} times with identical values",
+                "item_indices": indices,
+            })
+
+    return anomalies
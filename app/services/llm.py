@@ -1,18 +1,25 @@
-import google.generativeai as genai
 import os
 import json
 import logging
-from typing import Optional, Dict, Any, Tuple, List
+from typing import Optional, Dict, Any, Tuple, List, Iterator
 import re
 import time
+from app.core.compat import ensure_importlib_metadata
 from app.utils.pdf import split_pdf
-import json_repair
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from google.api_core import exceptions
+from app.services.replay import gemini_archive, is_replaying
+from app.services.deadline import Deadline, DeadlineExceededError, LatencyTracker, hedged_call
 
 logger = logging.getLogger(__name__)
 
 
+# google.generativeai alone takes ~1s to import; load it on first use
+# (or from the warm-up task) instead of at server start.
+def _genai():
+    ensure_importlib_metadata()
+    import google.generativeai as genai
+    return genai
+
+
 def sanitize_json(raw: str) -> str:
     """Clean LLM JSON output for safe parsing."""
     # 1. Remove markdown blocks
@@ -36,19 +43,94 @@ def sanitize_json(raw: str) -> str:
     return raw
 
 
-# Configure retry: Wait 2s, then 4s, then 8s... up to 5 times
-@retry(
-    retry=retry_if_exception_type(exceptions.ResourceExhausted),
-    wait=wait_exponential(multiplier=2, min=4, max=60),
-    stop=stop_after_attempt(5)
-)
-def call_gemini_safe(model, content):
-    """Call Gemini API with retry logic for quota exhaustion."""
-    return model.generate_content(content)
+# Retry waits: 4s, 8s, 16s... capped at 60s, at most 5 attempts, and
+# never longer than the request deadline leaves room for
+RETRY_MAX_ATTEMPTS = 5
+RETRY_MIN_WAIT = 4
+RETRY_MAX_WAIT = 60
+
+# Observed per-model latencies, used to decide when to hedge
+latency_tracker = LatencyTracker()
+# The duplicate (hedge) attempt gives up after this many times the hedge
+# delay, so a stuck hedge frees its GEMINI_MAX_INFLIGHT thread instead of
+# holding it until the request deadline (or forever without one)
+HEDGE_TIMEOUT_FACTOR = 2.0
+
+
+def _retryable_errors():
+    from google.api_core import exceptions
+    return (exceptions.ResourceExhausted, exceptions.ServiceUnavailable, exceptions.DeadlineExceeded)
+
+
+def _timeout_errors():
+    from google.api_core import exceptions
+    return (exceptions.DeadlineExceeded, TimeoutError)
+
 
+def _hedge_delay(model_name: str) -> Optional[float]:
+    """Latency percentile after which a duplicate request is sent (None = no hedging)."""
+    pct = float(os.environ.get("GEMINI_HEDGE_PERCENTILE", 95))
+    if pct <= 0:
+        return None
+    min_samples = int(os.environ.get("GEMINI_HEDGE_MIN_SAMPLES", 20))
+    return latency_tracker.percentile(model_name, pct, min_samples=min_samples)
 
-def extract_page_1(content: bytes, mime_type: str) -> Tuple[Dict[str, Any], Dict[str, int]]:
+
+def call_gemini_safe(model, content, deadline: Optional[Deadline] = None):
+    """
+    Call Gemini API with hedging and retries for quota exhaustion and
+    transient errors, all bounded by the request deadline. The primary
+    attempt is only bounded by the deadline, so a slow but valid page still
+    completes; the hedge attempt also times out after HEDGE_TIMEOUT_FACTOR
+    x the hedge delay. Timed-out attempts are recorded as latency samples.
+    """
+    deadline = deadline or Deadline.none()
+    model_name = getattr(model, "model_name", str(model))
+    retryable = _retryable_errors()
+    timed_out = _timeout_errors()
+
+    def attempt(cap: Optional[float] = None):
+        start = time.perf_counter()
+        timeout = deadline.remaining()
+        if cap is not None:
+            timeout = cap if timeout is None else min(timeout, cap)
+        request_options = {} if timeout is None else {"timeout": timeout}
+        try:
+            response = gemini_archive.call(
+                model, content, lambda: model.generate_content(content, request_options=request_options)
+            )
+        except timed_out:
+            # The call took at least this long; keep the window from
+            # learning only the fast calls
+            latency_tracker.observe(model_name, time.perf_counter() - start)
+            raise
+        latency_tracker.observe(model_name, time.perf_counter() - start)
+        return response
+
+    for attempt_no in range(1, RETRY_MAX_ATTEMPTS + 1):
+        deadline.check()
+        try:
+            hedge_after = _hedge_delay(model_name)
+            hedge_cap = None
+            if hedge_after is not None:
+                hedge_cap = float(os.environ.get("GEMINI_HEDGE_TIMEOUT_FACTOR", HEDGE_TIMEOUT_FACTOR)) * hedge_after
+            return hedged_call(attempt, deadline, hedge_after, hedge_fn=lambda: attempt(hedge_cap))
+        except retryable as e:
+            if attempt_no == RETRY_MAX_ATTEMPTS:
+                raise
+            wait = min(RETRY_MAX_WAIT, RETRY_MIN_WAIT * 2 ** (attempt_no - 1))
+            if not deadline.unbounded:
+                # Leave room for one more typical call after the wait
+                wait = min(wait, deadline.remaining() - (latency_tracker.percentile(model_name, 50) or 0.0))
+                if wait < 0:
+                    raise DeadlineExceededError("No time left to retry before the deadline") from e
+            logger.warning(f"{model_name} attempt {attempt_no} failed ({type(e).__name__}), retrying in {wait:.1f}s")
+            time.sleep(wait)
+
+
+def extract_page_1(content: bytes, mime_type: str, deadline: Optional[Deadline] = None) -> Tuple[Dict[str, Any], Dict[str, int]]:
     """Extract summary and metadata from Page 1 using Pro model."""
+    genai = _genai()
     api_key = os.environ.get("GEMINI_API_KEY")
     genai.configure(api_key=api_key)
     
@@ -85,9 +167,10 @@ def extract_page_1(content: bytes, mime_type: str) -> Tuple[Dict[str, Any], Dict
     """
     
     # Use safe call
-    response = call_gemini_safe(model, [{'mime_type': mime_type, 'data': content}, prompt])
+    response = call_gemini_safe(model, [{'mime_type': mime_type, 'data': content}, prompt], deadline)
     
     # Use json_repair for robust parsing
+    import json_repair
     data = json_repair.loads(response.text)
     
     usage = {
@@ -98,8 +181,10 @@ def extract_page_1(content: bytes, mime_type: str) -> Tuple[Dict[str, Any], Dict
     return data, usage
 
 
-def extract_line_items(content: bytes, mime_type: str, page_num: int) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+def extract_line_items(content: bytes, mime_type: str, page_num: int, categories: Optional[List[str]] = None,
+                       deadline: Optional[Deadline] = None) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
     """Extract line items from Page 2+ using Flash model."""
+    genai = _genai()
     api_key = os.environ.get("GEMINI_API_KEY")
     genai.configure(api_key=api_key)
     
@@ -113,22 +198,28 @@ def extract_line_items(content: bytes, mime_type: str, page_num: int) -> Tuple[L
         }
     )
 
+    category_hint = ""
+    if categories:
+        category_hint = f"Set \"category\" to the section heading the item is listed under, one of: {', '.join(categories)}. Use \"\" if unclear."
+
     prompt = f"""
     This is page {page_num} of a hospital bill. 
     Extract ONLY the tabular line items (medicines, services, charges).
     Ignore page headers repeated at the top.
     Ignore page footers.
+    {category_hint}
     
     Return strict JSON list:
     [
-      {{ "item_name": "...", "item_amount": 0.0, "item_rate": 0.0, "item_quantity": 0.0 }}
+      {{ "item_name": "...", "item_amount": 0.0, "item_rate": 0.0, "item_quantity": 0.0, "category": "" }}
     ]
     """
     
     # Use safe call
-    response = call_gemini_safe(model, [{'mime_type': mime_type, 'data': content}, prompt])
+    response = call_gemini_safe(model, [{'mime_type': mime_type, 'data': content}, prompt], deadline)
     
     # Use json_repair for robust parsing
+    import json_repair
     data = json_repair.loads(response.text)
     
     usage = {
@@ -139,13 +230,39 @@ def extract_line_items(content: bytes, mime_type: str, page_num: int) -> Tuple[L
     return data, usage
 
 
-def extract_with_llm(file_content: bytes, mime_type: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, int]]]:
-    """Extract bill data using Split & Merge strategy."""
+def extract_with_llm(file_content: bytes, mime_type: str, deadline_seconds: Optional[float] = None) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, int]]]:
+    """
+    Extract bill data using Split & Merge strategy.
+    Every Gemini call shares one deadline (`deadline_seconds`, default
+    EXTRACTION_DEADLINE_SECONDS; no deadline when unset or 0); pages that
+    could not be read in time are listed in `missing_pages` instead of
+    failing the whole bill.
+    """
+    for event in iter_extraction(file_content, mime_type, deadline_seconds):
+        if event["event"] == "done":
+            return event["data"], event["token_usage"]
+    return None, None
+
+
+def iter_extraction(file_content: bytes, mime_type: str, deadline_seconds: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Run the extraction and yield progress events as pages complete:
+      {"event": "summary", "page_count", "metadata", "category_summary"}
+      {"event": "page", "page_no", "bill_items", "token_usage"}   once per page read
+      {"event": "page_missing", "page_no", "reason"}              per skipped/failed page
+      {"event": "done", "data", "token_usage"}                    merged result, last
+    Yields nothing if no Gemini API key is configured.
+    """
+    if deadline_seconds is None:
+        deadline_seconds = float(os.environ.get("EXTRACTION_DEADLINE_SECONDS", 0)) or None
+    deadline = Deadline(deadline_seconds)
     
     api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
+    if not api_key and not is_replaying():
         logger.warning("GEMINI_API_KEY not found. Skipping LLM extraction.")
-        return None, None
+        return
+
+    from app.services.line_items import LineItemTable, dedupe_line_items, validate_line_items
 
     try:
         # 1. Split PDF if applicable
@@ -163,33 +280,64 @@ def extract_with_llm(file_content: bytes, mime_type: str) -> Tuple[Optional[Dict
         logger.info("Processing Page 1 (Summary)...")
         # For single images, we treat it as Page 1 but might need to adjust prompt if it has line items too.
         # Assuming the robust logic: Page 1 always has metadata.
-        summary_data, usage1 = extract_page_1(pages[0], mime_type if mime_type != "application/pdf" else "application/pdf")
+        missing_pages = []
+        try:
+            summary_data, usage1 = extract_page_1(pages[0], mime_type if mime_type != "application/pdf" else "application/pdf", deadline)
+        except DeadlineExceededError:
+            logger.warning("Deadline hit while reading the Page 1 summary")
+            summary_data, usage1 = {}, {}
+            missing_pages.append("1")
+            yield {"event": "page_missing", "page_no": "1", "reason": "deadline"}
         
         # Accumulate usage
         for k in total_usage: total_usage[k] += usage1.get(k, 0)
+
+        yield {
+            "event": "summary",
+            "page_count": len(pages),
+            "metadata": summary_data.get("metadata", {}),
+            "category_summary": summary_data.get("category_summary", []),
+        }
         
-        all_line_items = []
+        page_tables = []
+        categories = [
+            str(row.get("category"))
+            for row in summary_data.get("category_summary", [])
+            if isinstance(row, dict) and row.get("category")
+        ]
         
         # 3. Process Pages 2+ (Line Items)
         if len(pages) > 1:
             for i, page_content in enumerate(pages[1:], start=2):
+                if deadline.expired():
+                    logger.warning(f"Deadline hit, skipping pages {i}-{len(pages)}")
+                    for p in range(i, len(pages) + 1):
+                        missing_pages.append(str(p))
+                        yield {"event": "page_missing", "page_no": str(p), "reason": "deadline"}
+                    break
+
                 logger.info(f"Processing Page {i}...")
                 
-                # Rate Limit Delay: Sleep 2s between pages
-                time.sleep(2)
+                # Rate Limit Delay: Sleep 2s between pages (no quota to protect when replaying)
+                if not is_replaying():
+                    time.sleep(2 if deadline.unbounded else min(2, deadline.remaining()))
                 
                 try:
                     # For PDF split pages, they are still PDFs
                     p_mime = "application/pdf" if mime_type == "application/pdf" else mime_type
-                    items, usage_p = extract_line_items(page_content, p_mime, i)
+                    items, usage_p = extract_line_items(page_content, p_mime, i, categories, deadline)
                     
-                    if isinstance(items, list):
-                        all_line_items.extend(items)
+                    page_table = LineItemTable.from_items(items if isinstance(items, list) else [], page_no=i)
+                    page_tables.append(page_table)
                     
                     for k in total_usage: total_usage[k] += usage_p.get(k, 0)
+
+                    yield {"event": "page", "page_no": str(i), "bill_items": page_table.to_bill_items(), "token_usage": usage_p}
                     
                 except Exception as e:
                     logger.error(f"Error processing page {i}: {e}")
+                    missing_pages.append(str(i))
+                    yield {"event": "page_missing", "page_no": str(i), "reason": "deadline" if isinstance(e, DeadlineExceededError) else "error"}
                     # Continue to next page
                     continue
         else:
@@ -203,33 +351,52 @@ def extract_with_llm(file_content: bytes, mime_type: str) -> Tuple[Optional[Dict
             if len(pages) == 1:
                  logger.info("Single page document. Extracting line items from Page 1...")
                  try:
-                    items, usage_p = extract_line_items(pages[0], mime_type if mime_type != "application/pdf" else "application/pdf", 1)
-                    if isinstance(items, list):
-                        all_line_items.extend(items)
+                    items, usage_p = extract_line_items(pages[0], mime_type if mime_type != "application/pdf" else "application/pdf", 1, categories, deadline)
+                    page_table = LineItemTable.from_items(items if isinstance(items, list) else [], page_no=1)
+                    page_tables.append(page_table)
                     for k in total_usage: total_usage[k] += usage_p.get(k, 0)
+                    yield {"event": "page", "page_no": "1", "bill_items": page_table.to_bill_items(), "token_usage": usage_p}
                  except Exception as e:
                      logger.error(f"Error extracting line items from single page: {e}")
+                     if "1" not in missing_pages:
+                         missing_pages.append("1")
+                         yield {"event": "page_missing", "page_no": "1", "reason": "deadline" if isinstance(e, DeadlineExceededError) else "error"}
 
         # 4. Merge
+        table, merge_decisions = dedupe_line_items(LineItemTable.concat(page_tables))
+        if merge_decisions:
+            logger.info(f"Merge: dropped {len(merge_decisions)} duplicated rows across pages")
+        metadata = summary_data.get("metadata", {})
+        category_summary = summary_data.get("category_summary", [])
+
+        net_amount = metadata.get("net_amount", 0.0) if isinstance(metadata, dict) else 0.0
+        anomalies = validate_line_items(table, net_amount, category_summary)
+        total_extracted = table.total_amount()
+        logger.info(f"Validation: Net Amount ({net_amount}) vs Extracted Total ({total_extracted}), {len(anomalies)} anomalies")
+
         final_output = {
             "pagewise_line_items": [
                 {
                     "page_no": "All",
                     "page_type": "Merged",
-                    "bill_items": all_line_items
+                    "bill_items": table.to_bill_items()
                 }
             ],
-            "total_item_count": len(all_line_items),
-            "metadata": summary_data.get("metadata", {}),
-            "category_summary": summary_data.get("category_summary", [])
+            "total_item_count": len(table),
+            "reconciled_amount": total_extracted,
+            "anomalies": anomalies,
+            "merge_report": {
+                "duplicates_removed": len(merge_decisions),
+                "amount_removed": sum(d["item_amount"] for d in merge_decisions),
+                "decisions": merge_decisions
+            },
+            "is_partial": bool(missing_pages),
+            "missing_pages": missing_pages,
+            "metadata": metadata,
+            "category_summary": category_summary
         }
         
-       
-        net_amount = summary_data.get("metadata", {}).get("net_amount", 0.0)
-        total_extracted = sum(item.get("item_amount", 0) for item in all_line_items)
-        logger.info(f"Validation: Net Amount ({net_amount}) vs Extracted Total ({total_extracted})")
-        
-        return final_output, total_usage
+        yield {"event": "done", "data": final_output, "token_usage": total_usage}
 
     except Exception as e:
         logger.error(f"❌ Extraction failed: {str(e)}")
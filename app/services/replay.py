@@ -0,0 +1,198 @@
+"""
+Record/replay layer for Gemini calls.
+
+GEMINI_MODE selects the behaviour of every `generate_content` call:
+  live    call Gemini (default)
+  record  call Gemini and append the response to the archive
+  replay  serve responses from the archive, never touching the network
+
+Responses are keyed by (model, prompt hash, page digest) and stored in a
+gzip-compressed JSON-lines archive (GEMINI_ARCHIVE). Replayed calls sleep
+for the recorded latency times GEMINI_REPLAY_LATENCY_SCALE (0 = instant).
+
+Compact an archive (keep the latest response per key):
+    python -m app.services.replay compact [--archive PATH]
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ("live", "record", "replay")
+DEFAULT_ARCHIVE = "data/gemini_archive.jsonl.gz"
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when the archive has no response for a call."""
+
+
+def current_mode() -> str:
+    mode = os.environ.get("GEMINI_MODE", "live").lower()
+    if mode not in MODES:
+        raise ValueError(f"GEMINI_MODE must be one of {', '.join(MODES)}, got '{mode}'")
+    return mode
+
+
+def is_replaying() -> bool:
+    return current_mode() == "replay"
+
+
+def call_key(model, content: List[Any]) -> Dict[str, str]:
+    """(model, prompt hash, page digest) for a `generate_content` call."""
+    prompt = hashlib.sha256()
+    page = hashlib.sha256()
+    for part in content:
+        if isinstance(part, dict):
+            page.update(part.get("mime_type", "").encode())
+            page.update(part.get("data", b""))
+        else:
+            prompt.update(str(part).encode())
+    return {
+        "model": getattr(model, "model_name", str(model)),
+        "prompt_sha256": prompt.hexdigest(),
+        "page_sha256": page.hexdigest(),
+    }
+
+
+def _key_string(key: Dict[str, str]) -> str:
+    return f"{key['model']}|{key['prompt_sha256']}|{key['page_sha256']}"
+
+
+class RecordedResponse:
+    """Stand-in for a Gemini response: exposes `.text` and `.usage_metadata`."""
+
+    def __init__(self, text: str, usage: Dict[str, int]):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(**usage)
+
+
+class GeminiArchive:
+    """
+    Append-only archive of Gemini responses. Each append writes a new gzip
+    member, so recording never rewrites the file; `compact` collapses it.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self._path or os.environ.get("GEMINI_ARCHIVE", DEFAULT_ARCHIVE)
+
+    def _read(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            # Later entries win, matching what `compact` keeps
+            self._entries = {_key_string(e): e for e in self._read()}
+        return self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    def lookup(self, key: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._load().get(_key_string(key))
+
+    def append(self, entry: Dict[str, Any]):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            if self._entries is not None:
+                self._entries[_key_string(entry)] = entry
+
+    def compact(self) -> Dict[str, int]:
+        """Rewrite the archive as one gzip member with the latest entry per key."""
+        with self._lock:
+            entries = self._read()
+            latest = {_key_string(e): e for e in entries}
+            before = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            tmp_path = self.path + ".tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=9) as f:
+                for entry in latest.values():
+                    f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            os.replace(tmp_path, self.path)
+            self._entries = latest
+            return {
+                "entries_before": len(entries),
+                "entries_after": len(latest),
+                "bytes_before": before,
+                "bytes_after": os.path.getsize(self.path),
+            }
+
+    def call(self, model, content: List[Any], generate: Callable[[], Any]):
+        """Run `generate` according to GEMINI_MODE."""
+        mode = current_mode()
+        if mode == "live":
+            return generate()
+
+        key = call_key(model, content)
+
+        if mode == "replay":
+            entry = self.lookup(key)
+            if entry is None:
+                raise ReplayMissError(f"No recorded response for {key['model']} page {key['page_sha256'][:12]}")
+            scale = float(os.environ.get("GEMINI_REPLAY_LATENCY_SCALE", 1.0))
+            if scale > 0:
+                time.sleep(entry["latency"] * scale)
+            return RecordedResponse(entry["text"], entry["usage"])
+
+        start = time.perf_counter()
+        response = generate()
+        usage = response.usage_metadata
+        self.append({
+            **key,
+            "text": response.text,
+            "usage": {
+                "total_token_count": usage.total_token_count,
+                "prompt_token_count": usage.prompt_token_count,
+                "candidates_token_count": usage.candidates_token_count,
+            },
+            "latency": round(time.perf_counter() - start, 4),
+            "recorded_at": time.time(),
+        })
+        return response
+
+
+# Global instance
+gemini_archive = GeminiArchive()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Gemini record/replay archive tools")
+    parser.add_argument("command", choices=["compact", "stats"])
+    parser.add_argument("--archive", default=None, help=f"Archive path (default: $GEMINI_ARCHIVE or {DEFAULT_ARCHIVE})")
+    args = parser.parse_args(argv)
+
+    archive = GeminiArchive(args.archive)
+    if args.command == "compact":
+        stats = archive.compact()
+        print(
+            f"{archive.path}: {stats['entries_before']} -> {stats['entries_after']} entries, "
+            f"{stats['bytes_before']} -> {stats['bytes_after']} bytes"
+        )
+    else:
+        print(f"{archive.path}: {len(archive)} recorded responses")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fresh rows are compressed cheaply; compaction re-packs them harder
+WRITE_COMPRESSION_LEVEL = 1
+COMPACT_COMPRESSION_LEVEL = 9
+
+# Bill dates as printed by hospitals (day first), tried in order
+DATE_FORMATS = (
+    "%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%d-%m-%y",
+    "%d-%b-%Y", "%d %b %Y", "%d-%b-%y", "%d %B %Y", "%b %d, %Y", "%B %d, %Y",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    digest TEXT NOT NULL,
+    source TEXT,
+    bill_no TEXT,
+    patient_name TEXT,
+    patient_key TEXT,
+    admission_date TEXT,
+    discharge_date TEXT,
+    bill_date TEXT,
+    net_amount REAL,
+    created_at REAL NOT NULL,
+    compacted INTEGER NOT NULL DEFAULT 0,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_digest ON results (digest);
+CREATE INDEX IF NOT EXISTS idx_results_bill_no ON results (bill_no);
+CREATE INDEX IF NOT EXISTS idx_results_patient ON results (patient_key);
+CREATE INDEX IF NOT EXISTS idx_results_bill_date ON results (bill_date);
+CREATE INDEX IF NOT EXISTS idx_results_created ON results (created_at);
+"""
+
+SUMMARY_COLUMNS = (
+    "id", "digest", "source", "bill_no", "patient_name",
+    "admission_date", "discharge_date", "net_amount", "created_at",
+)
+
+
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def normalize_date(value: Any) -> Optional[str]:
+    """Parse a printed bill date into ISO `YYYY-MM-DD`, or None."""
+    text = str(value or "").strip()
+    if not text:
+        return None
+    # Drop a trailing time ("12/03/2024 10:30 AM")
+    candidates = [text, text.split(" ")[0]]
+    for candidate in candidates:
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(candidate, fmt).date().isoformat()
+            except ValueError:
+                continue
+    return None
+
+
+def _patient_key(name: Any) -> Optional[str]:
+    key = " ".join(str(name or "").lower().split())
+    return key or None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ResultStore:
+    """
+    Embedded SQLite store for every extraction result.
+    Header fields are copied into indexed columns; the full result is kept
+    as compressed JSON so lookups never need to call Gemini again.
+    """
+
+    def __init__(self, path: Optional[str] = None, compact_after_seconds: int = 7 * 86400):
+        self._path = path
+        self._compact_after = compact_after_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        # Resolved lazily so .env loaded in the lifespan is honoured
+        return self._path or os.environ.get("RESULT_STORE_PATH", "data/results.db")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def save(self, digest: str, data: Dict[str, Any], token_usage: Optional[Dict[str, int]] = None,
+             source: Optional[str] = None) -> int:
+        """Persist one extraction result and return its id."""
+        metadata = data.get("metadata") or {}
+        if not isinstance(metadata, dict):
+            metadata = {}
+        admission = normalize_date(metadata.get("admission_date"))
+        discharge = normalize_date(metadata.get("discharge_date"))
+        payload = zlib.compress(
+            json.dumps({"data": data, "token_usage": token_usage}).encode(), WRITE_COMPRESSION_LEVEL
+        )
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "INSERT INTO results (digest, source, bill_no, patient_name, patient_key, admission_date,"
+                " discharge_date, bill_date, net_amount, created_at, payload)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    digest,
+                    source,
+                    str(metadata.get("bill_no") or "").strip() or None,
+                    metadata.get("patient_name"),
+                    _patient_key(metadata.get("patient_name")),
+                    admission,
+                    discharge,
+                    discharge or admission,
+                    _to_float(metadata.get("net_amount")),
+                    time.time(),
+                    payload,
+                ),
+            )
+            conn.commit()
+            return cursor.lastrowid
+
+    def query(self, bill_no: Optional[str] = None, patient: Optional[str] = None,
+              date_from: Optional[str] = None, date_to: Optional[str] = None,
+              digest: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Look results up by any combination of filters, newest first.
+        `patient` matches a case-insensitive name prefix; the date range
+        applies to the discharge date (admission date if missing).
+        """
+        clauses, params = [], []
+        if digest:
+            clauses.append("digest = ?")
+            params.append(digest)
+        if bill_no:
+            clauses.append("bill_no = ?")
+            params.append(bill_no.strip())
+        key = _patient_key(patient)
+        if key:
+            # Range scan instead of LIKE so the index is used
+            clauses.append("patient_key >= ? AND patient_key < ?")
+            params.extend([key, key + "\U0010ffff"])
+        if date_from:
+            clauses.append("bill_date >= ?")
+            params.append(normalize_date(date_from) or date_from)
+        if date_to:
+            clauses.append("bill_date <= ?")
+            params.append(normalize_date(date_to) or date_to)
+
+        sql = "SELECT " + ", ".join(SUMMARY_COLUMNS) + ", payload FROM results"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+
+        results = []
+        for row in rows:
+            record = {col: row[col] for col in SUMMARY_COLUMNS}
+            record.update(json.loads(zlib.decompress(row["payload"])))
+            results.append(record)
+        return results
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Re-pack records older than `compact_after_seconds`: drop older
+        extractions of the same document, recompress payloads at the
+        highest level and give freed pages back to the filesystem.
+        """
+        cutoff = time.time() - self._compact_after
+        with self._lock:
+            conn = self._connect()
+            removed = conn.execute(
+                "DELETE FROM results WHERE created_at < ? AND id NOT IN"
+                " (SELECT MAX(id) FROM results GROUP BY digest)",
+                (cutoff,),
+            ).rowcount
+            rows = conn.execute(
+                "SELECT id, payload FROM results WHERE compacted = 0 AND created_at < ?", (cutoff,)
+            ).fetchall()
+            for row in rows:
+                packed = zlib.compress(zlib.decompress(row["payload"]), COMPACT_COMPRESSION_LEVEL)
+                conn.execute("UPDATE results SET payload = ?, compacted = 1 WHERE id = ?", (packed, row["id"]))
+            conn.commit()
+            if removed or rows:
+                conn.execute("VACUUM")
+        if removed or rows:
+            logger.info(f"Result store compacted: {removed} superseded, {len(rows)} repacked")
+        return {"removed": removed, "repacked": len(rows)}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Global instance
+result_store = ResultStore()
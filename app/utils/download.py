@@ -1,4 +1,3 @@
-import httpx
 import tempfile
 import os
 import mimetypes
@@ -6,6 +5,8 @@ from urllib.parse import urlparse
 from typing import Tuple
 
 async def download_file(url: str) -> Tuple[bytes, str]:
+    import httpx
+
     async with httpx.AsyncClient() as client:
         response = await client.get(url)
         response.raise_for_status()
@@ -1,36 +1,140 @@
-from PIL import Image, ImageEnhance
 import io
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+# Longest side sent to Gemini
+MAX_SIZE = 1024
+# Longest side of the grayscale copy used to measure the scan
+ANALYSIS_SIZE = 512
+# 1st..99th percentile luminance spread below which contrast is boosted
+MIN_DYNAMIC_RANGE = 128
+# Laplacian variance / dynamic range^2 below which the scan is sharpened
+MIN_SHARPNESS = 0.25
+# Mean channel difference below which the scan is encoded as grayscale
+MAX_GRAY_CHROMA = 6.0
+# Seconds to wait for the pool before sending the original bytes instead
+IMAGE_TIMEOUT_SECONDS = 30
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def analyze_image(image) -> Dict[str, Any]:
+    """
+    Measure contrast, blur and colourfulness on a downsampled copy.
+    Returns `dynamic_range` (0-255), `sharpness` (contrast-independent
+    Laplacian variance) and `chroma` (mean channel difference).
+    """
+    import numpy as np
+
+    # Integer box reduction is several times cheaper than a resize
+    factor = -(-max(image.size) // ANALYSIS_SIZE)
+    sample = image.reduce(factor) if factor > 1 else image
+    rgb = np.asarray(sample, dtype=np.int16)
+    gray = np.asarray(sample.convert("L"), dtype=np.float32)
+
+    low, high = np.percentile(gray, [1, 99])
+    dynamic_range = float(high - low)
+    laplacian = (
+        4 * gray[1:-1, 1:-1] - gray[:-2, 1:-1] - gray[2:, 1:-1] - gray[1:-1, :-2] - gray[1:-1, 2:]
+    )
+    sharpness = float(laplacian.var()) / max(dynamic_range, 1.0) ** 2
+    chroma = float(np.abs(np.diff(rgb, axis=2)).mean()) if rgb.ndim == 3 else 0.0
+    return {"dynamic_range": dynamic_range, "sharpness": sharpness, "chroma": chroma}
+
 
 def enhance_image(image_bytes: bytes) -> bytes:
     """
     Enhance image quality for better OCR/Extraction.
-    Applies contrast enhancement and sharpening.
+    Boosts contrast and sharpness only when the scan needs it and
+    returns the original bytes if nothing had to change.
     """
     try:
+        from PIL import Image, ImageEnhance
+
         image = Image.open(io.BytesIO(image_bytes))
-        
+        source_format = image.format
+        resized = max(image.size) > MAX_SIZE
+
+        # Let the JPEG decoder downscale by 1/2..1/8 while decoding
+        if max(image.size) > 2 * MAX_SIZE:
+            image.draft("RGB", (MAX_SIZE, MAX_SIZE))
+
         # Convert to RGB if necessary
         if image.mode != 'RGB':
             image = image.convert('RGB')
-            
-        # Resize if too large (max 1024px on longest side)
-        max_size = 1024
-        if max(image.size) > max_size:
-            image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-            
-        # Enhance Contrast
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(1.5)  # Increase contrast by 50%
-        
-        # Enhance Sharpness
-        enhancer = ImageEnhance.Sharpness(image)
-        image = enhancer.enhance(1.5)  # Increase sharpness by 50%
-        
-        # Save back to bytes with optimized quality
+
+        # Resize if too large (max 1024px on longest side); reduce() by
+        # integer factors first, resample only the last <2x step
+        if max(image.size) > MAX_SIZE:
+            image.thumbnail((MAX_SIZE, MAX_SIZE), Image.Resampling.BICUBIC, reducing_gap=2.0)
+
+        stats = analyze_image(image)
+        low_contrast = stats["dynamic_range"] < MIN_DYNAMIC_RANGE
+        blurry = stats["sharpness"] < MIN_SHARPNESS
+
+        if not (resized or low_contrast or blurry) and source_format in ("JPEG", "PNG"):
+            return image_bytes
+
+        if low_contrast:
+            image = ImageEnhance.Contrast(image).enhance(1.5)
+        if blurry:
+            image = ImageEnhance.Sharpness(image).enhance(1.5)
+
+        # Black-and-white scans lose nothing as single-channel JPEG
+        quality = 85
+        if stats["chroma"] < MAX_GRAY_CHROMA:
+            image = image.convert("L")
+            quality = 80
+
         output = io.BytesIO()
-        image.save(output, format='JPEG', quality=85, optimize=True)
+        image.save(output, format='JPEG', quality=quality)
         return output.getvalue()
-        
+
     except Exception as e:
         # If enhancement fails (e.g. not an image), return original bytes
         return image_bytes
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        workers = int(os.environ.get("IMAGE_WORKERS", 0)) or os.cpu_count() or 1
+        # Never fork: the pool is usually created while the warm-up and
+        # Gemini threads are importing modules, and a forked child would
+        # inherit their import locks held by threads that no longer exist.
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+async def enhance_image_async(image_bytes: bytes) -> bytes:
+    """
+    Run `enhance_image` in the process pool without blocking the event loop.
+    Falls back to the original bytes if the pool does not answer within
+    IMAGE_TIMEOUT_SECONDS.
+    """
+    loop = asyncio.get_running_loop()
+    timeout = float(os.environ.get("IMAGE_TIMEOUT_SECONDS", IMAGE_TIMEOUT_SECONDS))
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(_get_pool(), enhance_image, image_bytes), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Image enhancement timed out after {timeout}s, sending the original image")
+        return image_bytes
+
+
+def enhance_images(images: List[bytes]) -> List[bytes]:
+    """Enhance a batch of images in parallel across the process pool."""
+    return list(_get_pool().map(enhance_image, images))
+
+
+def shutdown_image_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
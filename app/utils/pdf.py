@@ -1,6 +1,5 @@
 import io
 from typing import List
-from pypdf import PdfReader, PdfWriter
 
 def split_pdf(file_content: bytes) -> List[bytes]:
     """
@@ -8,6 +7,8 @@ def split_pdf(file_content: bytes) -> List[bytes]:
     is a single page PDF.
     """
     try:
+        from pypdf import PdfReader, PdfWriter
+
         reader = PdfReader(io.BytesIO(file_content))
         pages = []
         
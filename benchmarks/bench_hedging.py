@@ -0,0 +1,110 @@
+"""
+Tail-latency benchmark for hedged Gemini calls.
+
+Drives `call_gemini_safe` with a fake model whose latency is log-normal
+with occasional stalls (a stuck request), once with hedging disabled and
+once hedging at the configured percentile, and reports per-page and
+per-bill p50/p95/p99 plus the extra calls hedging cost.
+
+Usage:
+    python benchmarks/bench_hedging.py [--bills 200] [--pages 5] [--median 0.05]
+        [--stall-rate 0.03] [--stall-factor 20] [--percentile 95]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import llm
+
+
+class FakeLatencyModel:
+    """Mimics `GenerativeModel.generate_content` timing without the network."""
+
+    def __init__(self, median: float, stall_rate: float, stall_factor: float, seed: int = 7):
+        self.model_name = "models/fake-latency"
+        self.median = median
+        self.stall_rate = stall_rate
+        self.stall_factor = stall_factor
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, content, request_options=None):
+        with self._lock:
+            self.calls += 1
+            latency = self.median * self._rng.lognormvariate(0, 0.25)
+            if self._rng.random() < self.stall_rate:
+                latency *= self.stall_factor
+        time.sleep(latency)
+        usage = SimpleNamespace(total_token_count=0, prompt_token_count=0, candidates_token_count=0)
+        return SimpleNamespace(text="[]", usage_metadata=usage)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def run(model, bills, pages, concurrency):
+    page_latencies, bill_latencies = [], []
+    lock = threading.Lock()
+
+    def bill(_):
+        start = time.perf_counter()
+        for page in range(pages):
+            t = time.perf_counter()
+            llm.call_gemini_safe(model, [{"mime_type": "image/png", "data": b"%d" % page}, "prompt"])
+            with lock:
+                page_latencies.append(time.perf_counter() - t)
+        with lock:
+            bill_latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(bill, range(bills)))
+    return page_latencies, bill_latencies
+
+
+def report(label, model, calls_before, pages_done, page_latencies, bill_latencies):
+    extra = (model.calls - calls_before) / pages_done - 1
+    print(f"{label:<16} page p50 {percentile(page_latencies, 50) * 1000:7.1f}ms  "
+          f"p99 {percentile(page_latencies, 99) * 1000:7.1f}ms | "
+          f"bill p50 {percentile(bill_latencies, 50) * 1000:7.1f}ms  "
+          f"p95 {percentile(bill_latencies, 95) * 1000:7.1f}ms  "
+          f"p99 {percentile(bill_latencies, 99) * 1000:7.1f}ms | extra calls {extra:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bills", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--median", type=float, default=0.05, help="Median page latency in seconds")
+    parser.add_argument("--stall-rate", type=float, default=0.03)
+    parser.add_argument("--stall-factor", type=float, default=20)
+    parser.add_argument("--percentile", type=float, default=95, help="Hedge after this latency percentile")
+    args = parser.parse_args()
+
+    os.environ["GEMINI_MODE"] = "live"
+    model = FakeLatencyModel(args.median, args.stall_rate, args.stall_factor)
+    pages_done = args.bills * args.pages
+
+    os.environ["GEMINI_HEDGE_PERCENTILE"] = "0"
+    calls = model.calls
+    report("no hedging", model, calls, pages_done, *run(model, args.bills, args.pages, args.concurrency))
+
+    # The no-hedging run filled the latency window the hedge delay is read from
+    os.environ["GEMINI_HEDGE_PERCENTILE"] = str(args.percentile)
+    calls = model.calls
+    report(f"hedge at p{args.percentile:g}", model, calls, pages_done,
+           *run(model, args.bills, args.pages, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
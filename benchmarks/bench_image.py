@@ -0,0 +1,119 @@
+"""
+Image pre-processing throughput benchmark.
+
+Compares the previous fixed-factor `enhance_image` (contrast + sharpness
+1.5x, JPEG optimize=True) with the adaptive pipeline, serially and across
+the process pool. Uses the scans in --corpus if given, otherwise a
+synthetic corpus of clean, blurred, faded and oversized bill scans.
+
+Usage:
+    python benchmarks/bench_image.py [--corpus DIR] [--repeat 3]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageFont
+
+from app.utils.image_processing import enhance_image, enhance_images, shutdown_image_pool
+
+
+def legacy_enhance_image(image_bytes: bytes) -> bytes:
+    """`enhance_image` as it was before the adaptive pipeline."""
+    image = Image.open(io.BytesIO(image_bytes))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    max_size = 1024
+    if max(image.size) > max_size:
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    image = ImageEnhance.Contrast(image).enhance(1.5)
+    image = ImageEnhance.Sharpness(image).enhance(1.5)
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=85, optimize=True)
+    return output.getvalue()
+
+
+def synthetic_scan(width: int, height: int) -> Image.Image:
+    font = ImageFont.load_default(size=max(12, width // 60))
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    step = max(20, width // 45)
+    for y in range(step, height - step, step):
+        draw.text((width // 25, y), "Paracetamol 500mg   2 x 12.50   25.00   Room Rent ICU   3000.00",
+                  fill="black", font=font)
+        draw.line((width // 30, y + step - 6, width - width // 30, y + step - 6), fill=(110, 110, 110))
+    return image
+
+
+def encode(image: Image.Image, fmt: str) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format=fmt, **({"quality": 92} if fmt == "JPEG" else {}))
+    return output.getvalue()
+
+
+def synthetic_corpus():
+    clean = synthetic_scan(1000, 1400)
+    large = synthetic_scan(3000, 4200)
+    return [
+        ("clean small jpeg", encode(synthetic_scan(730, 1024), "JPEG")),
+        ("clean jpeg", encode(clean, "JPEG")),
+        ("clean png", encode(clean, "PNG")),
+        ("blurred", encode(clean.filter(ImageFilter.GaussianBlur(1.5)), "JPEG")),
+        ("faded", encode(ImageEnhance.Contrast(clean).enhance(0.4), "JPEG")),
+        ("phone photo 12MP", encode(large, "JPEG")),
+        ("large png", encode(large, "PNG")),
+    ]
+
+
+def load_corpus(directory: str):
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith((".png", ".jpg", ".jpeg", ".webp", ".tif", ".tiff")):
+            with open(os.path.join(directory, name), "rb") as f:
+                corpus.append((name, f.read()))
+    return corpus
+
+
+def throughput(fn, images, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(images)
+    return repeat * len(images) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of sample scans")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    images = [data for _, data in corpus]
+    legacy_enhance_image(images[0])
+    enhance_image(images[0])
+
+    print(f"{'image':<20}{'input KB':>10}{'legacy KB':>11}{'new KB':>9}{'legacy ms':>11}{'new ms':>9}")
+    for name, data in corpus:
+        t0 = time.perf_counter()
+        old = legacy_enhance_image(data)
+        t1 = time.perf_counter()
+        new = enhance_image(data)
+        t2 = time.perf_counter()
+        print(f"{name[:19]:<20}{len(data) / 1024:>10.0f}{len(old) / 1024:>11.0f}{len(new) / 1024:>9.0f}"
+              f"{(t1 - t0) * 1000:>11.1f}{(t2 - t1) * 1000:>9.1f}")
+
+    # Warm the pool so process start-up is not counted
+    enhance_images(images[:1])
+    print()
+    print(f"legacy, serial        {throughput(lambda xs: [legacy_enhance_image(x) for x in xs], images, args.repeat):7.1f} images/sec")
+    print(f"adaptive, serial      {throughput(lambda xs: [enhance_image(x) for x in xs], images, args.repeat):7.1f} images/sec")
+    print(f"adaptive, process pool{throughput(enhance_images, images * 4, args.repeat):7.1f} images/sec")
+    shutdown_image_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Cold start benchmark for the API.
+
+Measures, each in a fresh interpreter:
+  * import time of `app.main`
+  * time from process spawn to the first `GET /` response
+  * time from process spawn until `GET /ready` reports warm-up done
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--port 8765]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure_import() -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def wait_for(url: str, deadline: float, expect_ok: bool = True) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200 or not expect_ok:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"No response from {url}")
+
+
+def measure_server(port: int, timeout: float = 60.0):
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + timeout
+        first_response = wait_for(f"http://127.0.0.1:{port}/", deadline) - start
+        ready = wait_for(f"http://127.0.0.1:{port}/ready", deadline) - start
+        return first_response, ready
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def summarize(label: str, samples):
+    print(f"{label:<28} median {statistics.median(samples):6.3f}s   min {min(samples):6.3f}s   max {max(samples):6.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    imports, first, ready = [], [], []
+    for _ in range(args.runs):
+        imports.append(measure_import())
+        f, r = measure_server(args.port)
+        first.append(f)
+        ready.append(r)
+
+    summarize("import app.main", imports)
+    summarize("time to first response", first)
+    summarize("time to ready", ready)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Offline soak and accuracy-regression run against a recorded Gemini archive.
+
+Record an archive once with real quota, e.g.
+    GEMINI_MODE=record uvicorn app.main:app    # then send the sample bills
+then replay it here at high concurrency without any network access:
+    python benchmarks/soak_replay.py bills/*.png --concurrency 32 --requests 500
+Use --latency-scale 0 for a pure CPU soak, 1 for recorded latency.
+--expected takes a JSON file mapping file names to expected fields
+({"sample_1.png": {"total_item_count": 30}}) to check accuracy.
+"""
+import argparse
+import json
+import mimetypes
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.llm import extract_with_llm
+from app.utils.image_processing import enhance_image
+
+
+def load_documents(paths):
+    documents = []
+    for path in paths:
+        mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        with open(path, "rb") as f:
+            content = f.read()
+        # Same pre-processing as the API so page digests match the recording
+        if mime_type.startswith("image/"):
+            content = enhance_image(content)
+        documents.append((os.path.basename(path), content, mime_type))
+    return documents
+
+
+def run_one(document):
+    name, content, mime_type = document
+    start = time.perf_counter()
+    try:
+        data, _ = extract_with_llm(content, mime_type)
+        error = None
+    except Exception as e:
+        data, error = None, f"{type(e).__name__}: {e}"
+    return name, time.perf_counter() - start, data, error
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("documents", nargs="+")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--archive", help="Archive path (default: $GEMINI_ARCHIVE)")
+    parser.add_argument("--expected", help="JSON file with expected fields per document")
+    args = parser.parse_args()
+
+    os.environ["GEMINI_MODE"] = "replay"
+    os.environ["GEMINI_REPLAY_LATENCY_SCALE"] = str(args.latency_scale)
+    if args.archive:
+        os.environ["GEMINI_ARCHIVE"] = args.archive
+
+    documents = load_documents(args.documents)
+    expected = {}
+    if args.expected:
+        with open(args.expected) as f:
+            expected = json.load(f)
+
+    workload = [documents[i % len(documents)] for i in range(args.requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(run_one, workload))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for _, latency, _, error in results if error is None]
+    errors = [(name, error) for name, _, _, error in results if error is not None]
+    mismatches = []
+    for name, _, data, error in results:
+        for field, value in expected.get(name, {}).items():
+            if error is None and data.get(field) != value:
+                mismatches.append((name, field, value, data.get(field)))
+
+    print(f"{len(results)} requests, concurrency {args.concurrency}, {elapsed:.2f}s, {len(results) / elapsed:.1f} req/s")
+    if latencies:
+        print(f"latency p50 {statistics.median(latencies):.3f}s  p95 {percentile(latencies, 95):.3f}s  "
+              f"p99 {percentile(latencies, 99):.3f}s  max {max(latencies):.3f}s")
+    for name, error in sorted(set(errors)):
+        print(f"ERROR {name}: {error}")
+    for name, field, want, got in sorted(set(mismatches)):
+        print(f"MISMATCH {name}: {field} expected {want}, got {got}")
+    return 1 if errors or mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
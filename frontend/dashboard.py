@@ -1,8 +1,10 @@
 import streamlit as st
 import requests
 import json
+import hashlib
+import pandas as pd
 from PIL import Image
-import io
+from requests.adapters import HTTPAdapter
 
 import os
 
@@ -18,15 +20,108 @@ st.sidebar.header("Configuration")
 default_url = os.environ.get("API_BASE_URL", "http://127.0.0.1:8000")
 base_url = st.sidebar.text_input("API Base URL", default_url)
 
-# Create tabs
-tab1, tab2 = st.tabs(["📁 Upload File", "🔗 Enter URL"])
+# (connect, read) timeouts; large bills take minutes
+REQUEST_TIMEOUT = (10, 600)
+PAGE_SIZES = [50, 100, 250, 500]
+ITEM_COLUMNS = ["item_name", "item_quantity", "item_rate", "item_amount", "item_category", "page_no"]
+
+# Results survive reruns so widget interactions never re-extract
+if "results" not in st.session_state:
+    st.session_state.results = {}
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """One pooled HTTP session shared by every rerun."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def stream_extraction(url, **kwargs):
+    """
+    POST to a streaming endpoint and render progress as NDJSON events arrive.
+    Returns the final response dict.
+    """
+    status = st.status("Extracting...", expanded=True)
+    progress = status.progress(0.0)
+    live_metrics = status.empty()
+    page_count, items, amount = 1, 0, 0.0
+    finished = set()
+
+    with get_session().post(url, stream=True, timeout=REQUEST_TIMEOUT, **kwargs) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            kind = event.get("event")
+            if kind == "summary":
+                page_count = max(1, event.get("page_count", 1))
+                # Page 1 of a multi-page bill is only read for the summary
+                if page_count > 1:
+                    finished.add("1")
+                patient = (event.get("metadata") or {}).get("patient_name")
+                status.write(f"Summary read: {page_count} page(s)" + (f", patient {patient}" if patient else ""))
+            elif kind == "page":
+                finished.add(event["page_no"])
+                page_items = event["bill_items"]
+                items += len(page_items)
+                amount += sum(item.get("item_amount", 0) for item in page_items)
+                status.write(f"Page {event['page_no']}: {len(page_items)} items")
+                # One small table per page, so each event only renders its own rows
+                if page_items:
+                    page_rows = [{**item, "page_no": event["page_no"]} for item in page_items]
+                    status.dataframe(pd.DataFrame(page_rows, columns=ITEM_COLUMNS), hide_index=True)
+            elif kind == "page_missing":
+                finished.add(event["page_no"])
+                status.write(f":orange[Page {event['page_no']} missing ({event.get('reason')})]")
+            elif kind == "error":
+                status.update(label="Extraction failed", state="error")
+                raise RuntimeError(event.get("detail"))
+            elif kind == "done":
+                status.update(label="Extraction complete", state="complete", expanded=False)
+                return event
+            progress.progress(min(1.0, len(finished) / page_count))
+            # Pages are merged and de-duplicated only in the final result
+            live_metrics.markdown(f"**{items}** items read so far, **{amount:,.2f}** total (before duplicate removal)")
+
+    status.update(label="Extraction ended without a result", state="error")
+    raise RuntimeError("Stream ended before the extraction finished")
 
-def display_results(result):
+
+def items_frame(data) -> pd.DataFrame:
+    rows = [
+        {**item, "page_no": page.get("page_no")}
+        for page in data.get("pagewise_line_items", [])
+        for item in page.get("bill_items", [])
+    ]
+    return pd.DataFrame(rows, columns=ITEM_COLUMNS)
+
+
+def display_items(df: pd.DataFrame, key: str):
+    """Paginated item table; st.dataframe only renders the visible rows."""
+    query = st.text_input("Filter items", key=f"{key}-filter")
+    if query:
+        df = df[df["item_name"].str.contains(query, case=False, na=False, regex=False)]
+
+    col1, col2 = st.columns([1, 3])
+    page_size = col1.selectbox("Rows per page", PAGE_SIZES, key=f"{key}-size")
+    pages = max(1, -(-len(df) // page_size))
+    page = col2.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}-page")
+    start = (page - 1) * page_size
+    st.dataframe(df.iloc[start:start + page_size], hide_index=True)
+    st.caption(f"Rows {start + 1 if len(df) else 0}-{min(start + page_size, len(df))} of {len(df)}")
+
+
+def display_results(result, key: str):
     if result.get("is_success"):
         st.success("Extraction Successful!")
-        
+
         data = result.get("data", {})
-        
+
         # Fraud Detection Display
         fraud = data.get("fraud_signals", {})
         if fraud and fraud.get("is_suspicious"):
@@ -36,29 +131,53 @@ def display_results(result):
         else:
             st.success("✅ No Fraud Detected")
 
-        col1, col2 = st.columns(2)
-        col1.metric("Total Items", data.get("total_item_count", 0))
-        col2.metric("Total Amount", f"{data.get('reconciled_amount', 0.0):.2f}")
-        
-        st.subheader("Extracted Data (JSON)")
-        st.json(data)
-        
+        if data.get("is_partial"):
+            st.warning(f"Partial result: pages {', '.join(data.get('missing_pages', []))} could not be read.")
+
+        df = items_frame(data)
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Items", data.get("total_item_count", len(df)))
+        col2.metric("Total Amount", f"{data.get('reconciled_amount', df['item_amount'].sum()):.2f}")
+        col3.metric("Anomalies", len(data.get("anomalies", [])))
+
+        # Aggregated here rather than by another API call
+        if not df.empty:
+            st.subheader("Category Totals")
+            totals = (
+                df.assign(item_category=df["item_category"].fillna("").replace("", "uncategorized"))
+                .groupby("item_category", as_index=False)
+                .agg(items=("item_name", "size"), amount=("item_amount", "sum"))
+                .sort_values("amount", ascending=False)
+            )
+            st.dataframe(totals, hide_index=True)
+
+        if data.get("anomalies"):
+            with st.expander(f"Anomalies ({len(data['anomalies'])})"):
+                for anomaly in data["anomalies"]:
+                    st.markdown(f"- **{anomaly['kind']}**: {anomaly['message']}")
+
         st.subheader("Line Items Detail")
-        items = []
-        for page in data.get("pagewise_line_items", []):
-            for item in page.get("bill_items", []):
-                items.append(item)
-        
-        if items:
-            st.table(items)
+        if not df.empty:
+            display_items(df, key)
+
+        # The full JSON is only rendered on request; large bills hang the browser
+        with st.expander("Extracted Data (JSON)"):
+            st.download_button("Download JSON", json.dumps(result, indent=2), file_name="extraction.json",
+                               mime="application/json", key=f"{key}-download")
+            if st.checkbox("Show JSON", key=f"{key}-json"):
+                st.json(data, expanded=False)
     else:
         st.error("Extraction failed.")
 
+# Create tabs
+tab1, tab2 = st.tabs(["📁 Upload File", "🔗 Enter URL"])
+
 # --- Tab 1: File Upload ---
 with tab1:
     st.markdown("Upload a local bill image or PDF.")
     uploaded_file = st.file_uploader("Choose a file", type=['png', 'jpg', 'jpeg', 'pdf'])
-    
+
     if uploaded_file is not None:
         if uploaded_file.type.startswith('image'):
             image = Image.open(uploaded_file)
@@ -66,27 +185,29 @@ with tab1:
         elif uploaded_file.type == 'application/pdf':
             st.info("PDF uploaded. Preview not available.")
 
+        file_key = "file-" + hashlib.sha256(uploaded_file.getvalue()).hexdigest()
         if st.button("Extract from File"):
-            with st.spinner("Extracting..."):
-                try:
-                    files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-                    response = requests.post(f"{base_url}/extract-from-file", files=files)
-                    response.raise_for_status()
-                    display_results(response.json())
-                except Exception as e:
-                    st.error(f"Error: {e}")
+            try:
+                files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
+                st.session_state.results[file_key] = stream_extraction(f"{base_url}/extract-from-file/stream", files=files)
+            except Exception as e:
+                st.error(f"Error: {e}")
+
+        if file_key in st.session_state.results:
+            display_results(st.session_state.results[file_key], file_key)
 
 # --- Tab 2: URL Input ---
 with tab2:
     st.markdown("Enter a URL to a bill image or PDF.")
     url_input = st.text_input("Document URL", "https://example.com/bill.jpg")
-    
+
+    url_key = "url-" + url_input
     if st.button("Extract from URL"):
-        with st.spinner("Extracting..."):
-            try:
-                payload = {"document": url_input}
-                response = requests.post(f"{base_url}/extract-bill-data", json=payload)
-                response.raise_for_status()
-                display_results(response.json())
-            except Exception as e:
-                st.error(f"Error: {e}")
+        try:
+            payload = {"document": url_input}
+            st.session_state.results[url_key] = stream_extraction(f"{base_url}/extract-bill-data/stream", json=payload)
+        except Exception as e:
+            st.error(f"Error: {e}")
+
+    if url_key in st.session_state.results:
+        display_results(st.session_state.results[url_key], url_key)
@@ -0,0 +1,155 @@
+import os
+import sys
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.api_core import exceptions
+
+from app.services import llm
+from app.services.deadline import Deadline, DeadlineExceededError, hedged_call
+
+# Some tests stub out time.sleep for the retry and page delays
+real_sleep = time.sleep
+
+
+def sleeper(delays):
+    """Callable returning the call index after sleeping delays[index]."""
+    calls = []
+
+    def fn():
+        index = len(calls)
+        calls.append(index)
+        real_sleep(delays[index])
+        return index
+
+    return fn, calls
+
+
+def test_hedge_wins_over_stuck_call():
+    fn, calls = sleeper([1.0, 0.01])
+    start = time.perf_counter()
+    assert hedged_call(fn, Deadline(5), hedge_after=0.05) == 1
+    assert time.perf_counter() - start < 0.5
+    assert len(calls) == 2
+
+
+def test_no_hedge_when_call_is_fast():
+    fn, calls = sleeper([0.01, 0.01])
+    assert hedged_call(fn, Deadline(5), hedge_after=0.2) == 0
+    assert len(calls) == 1
+
+
+def test_deadline_stops_waiting():
+    fn, _ = sleeper([1.0, 1.0])
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceededError):
+        hedged_call(fn, Deadline(0.1), hedge_after=None)
+    assert time.perf_counter() - start < 0.5
+
+
+class FlakyModel:
+    model_name = "models/flaky"
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.timeouts = []
+
+    def generate_content(self, content, request_options=None):
+        self.timeouts.append((request_options or {}).get("timeout"))
+        if self.failures:
+            self.failures -= 1
+            raise exceptions.ResourceExhausted("quota")
+        return SimpleNamespace(text="[]")
+
+
+def test_retry_wait_is_capped_by_deadline(monkeypatch):
+    monkeypatch.setenv("GEMINI_MODE", "live")
+    waits = []
+    monkeypatch.setattr(llm.time, "sleep", waits.append)
+    model = FlakyModel(failures=1)
+    llm.call_gemini_safe(model, ["prompt"], Deadline(1.5))
+    assert len(waits) == 1 and waits[0] <= 1.5
+    assert all(0 < t <= 1.5 for t in model.timeouts)
+
+
+def test_gives_up_when_deadline_leaves_no_room(monkeypatch):
+    monkeypatch.setenv("GEMINI_MODE", "live")
+    llm.latency_tracker.observe("models/flaky", 5.0)
+    try:
+        with pytest.raises(DeadlineExceededError):
+            llm.call_gemini_safe(FlakyModel(failures=1), ["prompt"], Deadline(1.0))
+    finally:
+        llm.latency_tracker.clear()
+
+
+class SlowModel:
+    """Valid page that takes `delay` seconds; honours the request timeout."""
+    model_name = "models/slow"
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.timeouts = []
+
+    def generate_content(self, content, request_options=None):
+        timeout = (request_options or {}).get("timeout")
+        self.timeouts.append(timeout)
+        if timeout is not None and self.delay > timeout:
+            real_sleep(timeout)
+            raise exceptions.DeadlineExceeded("timed out")
+        real_sleep(self.delay)
+        return SimpleNamespace(text="[]")
+
+
+def test_slow_page_succeeds_when_only_the_hedge_is_capped(monkeypatch):
+    monkeypatch.setenv("GEMINI_MODE", "live")
+    monkeypatch.setenv("GEMINI_HEDGE_MIN_SAMPLES", "1")
+    waits = []
+    monkeypatch.setattr(llm.time, "sleep", waits.append)
+    llm.latency_tracker.observe("models/slow", 0.1)
+    try:
+        model = SlowModel(delay=0.35)
+        assert llm.call_gemini_safe(model, ["prompt"]).text == "[]"
+        # Primary uncapped, hedge capped at 2x the 0.1s hedge delay
+        assert model.timeouts == [None, pytest.approx(0.2)]
+        assert waits == []
+        # The timed-out hedge and the slow success both reach the window
+        assert llm.latency_tracker.percentile("models/slow", 100) >= 0.35
+        assert llm.latency_tracker.percentile("models/slow", 0, min_samples=3) == 0.1
+    finally:
+        llm.latency_tracker.clear()
+
+
+def test_extract_returns_partial_result_on_deadline(monkeypatch):
+    page_delay = {b"page-1": 0.0, b"page-2": 0.0, b"page-3": 2.0, b"page-4": 0.0}
+
+    def fake_generate(self, content, request_options=None):
+        delay = page_delay[content[0]["data"]]
+        if delay > request_options["timeout"]:
+            real_sleep(request_options["timeout"])
+            raise exceptions.DeadlineExceeded("timed out")
+        real_sleep(delay)
+        if self.model_name.endswith("pro"):
+            text = json.dumps({"metadata": {"net_amount": 10}})
+        else:
+            text = json.dumps([{"item_name": content[0]["data"].decode(), "item_amount": 10, "item_rate": 10, "item_quantity": 1}])
+        usage = SimpleNamespace(total_token_count=1, prompt_token_count=1, candidates_token_count=0)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    genai = llm._genai()
+    monkeypatch.setenv("GEMINI_MODE", "live")
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    monkeypatch.setenv("GEMINI_HEDGE_PERCENTILE", "0")
+    monkeypatch.setattr(genai.GenerativeModel, "generate_content", fake_generate)
+    monkeypatch.setattr(llm, "split_pdf", lambda content: list(page_delay))
+    monkeypatch.setattr(llm.time, "sleep", lambda seconds: None)
+
+    data, _ = llm.extract_with_llm(b"%PDF", "application/pdf", deadline_seconds=0.5)
+
+    assert data["is_partial"] is True
+    assert data["missing_pages"] == ["3", "4"]
+    assert [item["item_name"] for item in data["pagewise_line_items"][0]["bill_items"]] == ["page-2"]
@@ -0,0 +1,80 @@
+import io
+import os
+import sys
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageFont
+
+from app.utils import image_processing
+from app.utils.image_processing import (
+    MIN_DYNAMIC_RANGE, MIN_SHARPNESS, analyze_image, enhance_image, enhance_image_async, shutdown_image_pool,
+)
+
+
+def scan(width=700, height=900):
+    font = ImageFont.load_default(size=24)
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(30, height - 30, 32):
+        draw.text((30, y), "Room Rent ICU   2 x 1500.00   3000.00", fill="black", font=font)
+    return image
+
+
+def encode(image, fmt="JPEG"):
+    output = io.BytesIO()
+    image.save(output, format=fmt)
+    return output.getvalue()
+
+
+def test_analyze_separates_clean_faded_and_blurred():
+    clean = analyze_image(scan())
+    faded = analyze_image(ImageEnhance.Contrast(scan()).enhance(0.4))
+    blurred = analyze_image(scan().filter(ImageFilter.GaussianBlur(2)))
+    assert clean["dynamic_range"] >= MIN_DYNAMIC_RANGE and clean["sharpness"] >= MIN_SHARPNESS
+    assert faded["dynamic_range"] < MIN_DYNAMIC_RANGE
+    assert blurred["sharpness"] < MIN_SHARPNESS
+    assert clean["chroma"] == 0.0
+
+
+def test_clean_scan_is_passed_through():
+    original = encode(scan())
+    assert enhance_image(original) is original
+
+
+def test_faded_scan_is_enhanced_as_grayscale_jpeg():
+    result = Image.open(io.BytesIO(enhance_image(encode(ImageEnhance.Contrast(scan()).enhance(0.4), "PNG"))))
+    assert result.format == "JPEG"
+    assert result.mode == "L"
+    assert analyze_image(result)["dynamic_range"] > analyze_image(ImageEnhance.Contrast(scan()).enhance(0.4))["dynamic_range"]
+
+
+def test_large_scan_is_downscaled():
+    result = Image.open(io.BytesIO(enhance_image(encode(scan(2400, 3200)))))
+    assert max(result.size) == 1024
+
+
+def test_non_image_bytes_are_returned_unchanged():
+    assert enhance_image(b"%PDF-1.4 not an image") == b"%PDF-1.4 not an image"
+
+
+def test_async_enhancement_uses_a_non_fork_pool():
+    original = encode(scan(2400, 3200))
+    try:
+        result = asyncio.run(enhance_image_async(original))
+        assert image_processing._pool._mp_context.get_start_method() in ("forkserver", "spawn")
+    finally:
+        shutdown_image_pool()
+    assert max(Image.open(io.BytesIO(result)).size) == 1024
+
+
+def test_async_enhancement_falls_back_on_timeout(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(image_processing, "_get_pool", lambda: pool)
+    monkeypatch.setattr(image_processing, "enhance_image", lambda data: time.sleep(0.5) or b"late")
+    monkeypatch.setenv("IMAGE_TIMEOUT_SECONDS", "0.05")
+    assert asyncio.run(enhance_image_async(b"original")) == b"original"
+    pool.shutdown(wait=True)
@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.schemas import ExtractionData
+from app.services.line_items import LineItemTable, dedupe_line_items, validate_line_items
+
+
+def make_item(name, amount, rate, qty, category=""):
+    return {"item_name": name, "item_amount": amount, "item_rate": rate, "item_quantity": qty, "category": category}
+
+
+def kinds(anomalies):
+    return [a["kind"] for a in anomalies]
+
+
+def test_from_items_coerces_llm_numbers():
+    table = LineItemTable.from_items(
+        [
+            make_item("Paracetamol", "1,200.50", "Rs 600.25", "2"),
+            make_item("Gauze", None, 5, 0),
+            make_item("Syringe", "Rs. 1,200.00", "Rs.500", "2.4 units"),
+            make_item("Refund", "-50", "n/a", ""),
+            "not a row",
+        ],
+        page_no=3,
+    )
+    assert len(table) == 4
+    assert table.amounts.tolist() == [1200.5, 0.0, 1200.0, -50.0]
+    assert table.rates.tolist() == [600.25, 5.0, 500.0, 0.0]
+    assert table.quantities.tolist() == [2.0, 0.0, 2.4, 0.0]
+    assert table.pages.tolist() == [3, 3, 3, 3]
+
+
+def test_clean_bill_has_no_anomalies():
+    table = LineItemTable.from_items(
+        [make_item("Room Rent", 3000, 1500, 2, "Room"), make_item("CBC", 400, 400, 1, "Lab")], page_no=1
+    )
+    summary = [{"category": "room", "gross_amount": 3000}, {"category": "LAB ", "gross_amount": 400.4}]
+    assert validate_line_items(table, 3400, summary) == []
+
+
+def test_flags_rate_quantity_mismatch():
+    table = LineItemTable.from_items(
+        [make_item("A", 100, 10, 10), make_item("B", 150, 10, 10), make_item("C", 70, 0, 1)], page_no=1
+    )
+    anomalies = validate_line_items(table)
+    assert kinds(anomalies) == ["amount_mismatch"]
+    assert anomalies[0]["item_indices"] == [1]
+
+
+def test_flags_category_and_net_mismatch():
+    table = LineItemTable.from_items(
+        [make_item("A", 100, 100, 1, "Pharmacy"), make_item("B", 50, 50, 1, "Pharmacy"), make_item("C", 10, 10, 1)],
+        page_no=1,
+    )
+    summary = [{"category": "Pharmacy", "gross_amount": 500}, {"category": "Lab", "gross_amount": 900}]
+    anomalies = validate_line_items(table, 1000, summary)
+    assert kinds(anomalies) == ["category_total_mismatch", "net_amount_mismatch"]
+    assert anomalies[0]["item_indices"] == [0, 1]
+    assert anomalies[0]["actual"] == 150.0
+    assert anomalies[1]["actual"] == 160.0
+
+
+def test_flags_duplicate_rows():
+    first = LineItemTable.from_items([make_item("Saline ", 40, 40, 1), make_item("X", 1, 1, 1)], page_no=1)
+    second = LineItemTable.from_items([make_item("saline", 40.001, 40, 1)], page_no=2)
+    anomalies = validate_line_items(LineItemTable.concat([first, second]))
+    assert kinds(anomalies) == ["duplicate_row"]
+    assert anomalies[0]["item_indices"] == [0, 2]
+
+
+def page(page_no, *names):
+    return LineItemTable.from_items([make_item(name, 10, 10, 1) for name in names], page_no=page_no)
+
+
+def test_dedupe_drops_page_break_overlap():
+    table = LineItemTable.concat([page(1, "A", "B", "C"), page(2, "B", "C", "D", "E"), page(3, "D", "E", "F")])
+    kept, decisions = dedupe_line_items(table)
+    assert kept.names.tolist() == ["A", "B", "C", "D", "E", "F"]
+    assert [(d["item_name"], d["page_no"], d["duplicate_of_page"], d["reason"]) for d in decisions] == [
+        ("B", "2", "1", "page_boundary"),
+        ("C", "2", "1", "page_boundary"),
+        ("D", "3", "2", "page_boundary"),
+        ("E", "3", "2", "page_boundary"),
+    ]
+
+
+def test_dedupe_keeps_recurring_charge_across_page_break():
+    # Day 2 of "Room Rent" is the first row of the next page
+    table = LineItemTable.concat([page(2, "X", "Y", "Room Rent"), page(3, "Room Rent", "Z")])
+    kept, decisions = dedupe_line_items(table)
+    assert len(kept) == 5
+    assert decisions == []
+    assert kinds(validate_line_items(kept)) == ["duplicate_row"]
+
+
+def test_dedupe_drops_repeated_block_anywhere():
+    table = LineItemTable.concat([page(1, "A", "B", "C", "D"), page(2, "X", "B", "C", "D", "Y")])
+    kept, decisions = dedupe_line_items(table)
+    assert kept.names.tolist() == ["A", "B", "C", "D", "X", "Y"]
+    assert {d["reason"] for d in decisions} == {"repeated_block"}
+
+
+def test_dedupe_keeps_short_repeats_and_same_page_rows():
+    # Day-wise charges repeat on later pages and within a page
+    table = LineItemTable.concat([page(1, "Room", "Nursing", "Room"), page(2, "X", "Room", "Nursing")])
+    kept, decisions = dedupe_line_items(table)
+    assert len(kept) == len(table)
+    assert decisions == []
+
+
+def test_dedupe_is_linear_on_large_documents():
+    pages = [
+        page(p, *[f"item-{p}-{i}" for i in range(500)], f"item-{p + 1}-0", f"item-{p + 1}-1") for p in range(20)
+    ]
+    table = LineItemTable.concat(pages)
+    start = time.perf_counter()
+    kept, decisions = dedupe_line_items(table)
+    assert time.perf_counter() - start < 1.0
+    assert len(decisions) == 2 * 19
+    assert len(kept) == 10_000 + 2
+
+
+def test_serializes_to_extraction_schema():
+    table = LineItemTable.from_items([make_item("A", 10, 5, 2, "Lab")], page_no=1)
+    data = ExtractionData(
+        pagewise_line_items=[{"page_no": "All", "page_type": "Merged", "bill_items": table.to_bill_items()}],
+        total_item_count=len(table),
+        reconciled_amount=table.total_amount(),
+        anomalies=validate_line_items(table, 99),
+    )
+    assert data.pagewise_line_items[0].bill_items[0].item_name == "A"
+    assert data.anomalies[0].kind == "net_amount_mismatch"
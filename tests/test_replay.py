@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import llm
+from app.services.replay import GeminiArchive, ReplayMissError, call_key, main
+
+PAGE = {"mime_type": "image/png", "data": b"page-1"}
+
+
+class FakeModel:
+    model_name = "models/fake"
+
+    def __init__(self, text='{"ok": true}'):
+        self.calls = 0
+        self.text = text
+
+    def generate_content(self, content):
+        self.calls += 1
+        usage = SimpleNamespace(total_token_count=30, prompt_token_count=20, candidates_token_count=10)
+        return SimpleNamespace(text=self.text, usage_metadata=usage)
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setenv("GEMINI_REPLAY_LATENCY_SCALE", "0")
+    return GeminiArchive(str(tmp_path / "archive.jsonl.gz"))
+
+
+def test_key_separates_model_prompt_and_page():
+    model = FakeModel()
+    base = call_key(model, [PAGE, "prompt"])
+    assert call_key(model, [PAGE, "prompt"]) == base
+    assert call_key(model, [PAGE, "other prompt"])["prompt_sha256"] != base["prompt_sha256"]
+    assert call_key(model, [{"mime_type": "image/png", "data": b"page-2"}, "prompt"])["page_sha256"] != base["page_sha256"]
+
+
+def test_record_then_replay(archive, monkeypatch):
+    model = FakeModel()
+    monkeypatch.setenv("GEMINI_MODE", "record")
+    archive.call(model, [PAGE, "prompt"], lambda: model.generate_content(None))
+    assert model.calls == 1
+
+    monkeypatch.setenv("GEMINI_MODE", "replay")
+    replayed = GeminiArchive(archive.path).call(model, [PAGE, "prompt"], lambda: model.generate_content(None))
+    assert model.calls == 1
+    assert replayed.text == '{"ok": true}'
+    assert replayed.usage_metadata.total_token_count == 30
+
+    with pytest.raises(ReplayMissError):
+        archive.call(model, [PAGE, "unrecorded"], lambda: model.generate_content(None))
+
+
+def test_compact_keeps_latest_entry(archive, monkeypatch, capsys):
+    monkeypatch.setenv("GEMINI_MODE", "record")
+    for text in ("first", "second"):
+        model = FakeModel(text)
+        archive.call(model, [PAGE, "prompt"], lambda: model.generate_content(None))
+    archive.call(model, [PAGE, "other"], lambda: model.generate_content(None))
+
+    main(["compact", "--archive", archive.path])
+    assert "3 -> 2 entries" in capsys.readouterr().out
+
+    monkeypatch.setenv("GEMINI_MODE", "replay")
+    assert GeminiArchive(archive.path).call(model, [PAGE, "prompt"], None).text == "second"
+
+
+def test_extract_with_llm_replays_offline(archive, monkeypatch):
+    responses = {
+        "models/gemini-2.5-pro": {"metadata": {"net_amount": 30}, "category_summary": []},
+        "models/gemini-2.0-flash": [{"item_name": "Gauze", "item_amount": 30, "item_rate": 10, "item_quantity": 3}],
+    }
+
+    def fake_generate(self, content, **kwargs):
+        usage = SimpleNamespace(total_token_count=3, prompt_token_count=2, candidates_token_count=1)
+        return SimpleNamespace(text=json.dumps(responses[self.model_name]), usage_metadata=usage)
+
+    genai = llm._genai()
+    monkeypatch.setattr(llm, "gemini_archive", archive)
+    monkeypatch.setenv("GEMINI_API_KEY", "recording-key")
+    monkeypatch.setenv("GEMINI_MODE", "record")
+    monkeypatch.setattr(genai.GenerativeModel, "generate_content", fake_generate)
+    recorded, _ = llm.extract_with_llm(b"image-bytes", "image/png")
+
+    monkeypatch.delenv("GEMINI_API_KEY")
+    monkeypatch.setenv("GEMINI_MODE", "replay")
+    monkeypatch.setattr(genai.GenerativeModel, "generate_content", None)
+    replayed, usage = llm.extract_with_llm(b"image-bytes", "image/png")
+
+    assert replayed == recorded
+    assert replayed["total_item_count"] == 1
+    assert usage == {"total_tokens": 6, "input_tokens": 4, "output_tokens": 2}
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_does_not_load_heavy_dependencies():
+    snippet = (
+        "import sys, app.main; "
+        "print(','.join(m for m in ('google.generativeai', 'PIL.Image', 'pypdf', 'json_repair', 'numpy') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", snippet], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_ready_after_warmup():
+    with TestClient(app) as client:
+        deadline = time.time() + 30
+        response = client.get("/ready")
+        while response.status_code != 200 and time.time() < deadline:
+            time.sleep(0.05)
+            response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["ready"] is True
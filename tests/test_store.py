@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.schemas import StoredResult
+from app.services.store import ResultStore, content_digest, normalize_date
+
+
+def make_result(bill_no, patient, discharge, net=100.0):
+    return {
+        "pagewise_line_items": [{"page_no": "All", "page_type": "Merged", "bill_items": [
+            {"item_name": "Room", "item_amount": net, "item_rate": net, "item_quantity": 1},
+        ]}],
+        "total_item_count": 1,
+        "metadata": {
+            "patient_name": patient,
+            "bill_no": bill_no,
+            "admission_date": "01/01/2024",
+            "discharge_date": discharge,
+            "net_amount": net,
+        },
+    }
+
+
+USAGE = {"total_tokens": 3, "input_tokens": 2, "output_tokens": 1}
+
+
+def test_normalize_date():
+    assert normalize_date("05/03/2024") == "2024-03-05"
+    assert normalize_date("05-Mar-2024 10:30 AM") == "2024-03-05"
+    assert normalize_date("2024-03-05") == "2024-03-05"
+    assert normalize_date("n/a") is None
+
+
+def test_save_and_query(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    store.save(content_digest(b"a"), make_result("B-1", "Ravi Kumar", "10/01/2024"), USAGE, source="a.png")
+    store.save(content_digest(b"b"), make_result("B-2", "ravi  kumari", "20/02/2024"), USAGE, source="b.png")
+    store.save(content_digest(b"c"), make_result("B-3", "Anita", "15/03/2024"), None, source="c.png")
+
+    assert [r["bill_no"] for r in store.query(bill_no="B-2")] == ["B-2"]
+    assert [r["bill_no"] for r in store.query(patient="RAVI KUM")] == ["B-2", "B-1"]
+    assert [r["bill_no"] for r in store.query(date_from="01/02/2024", date_to="2024-03-31")] == ["B-3", "B-2"]
+    assert [r["source"] for r in store.query(digest=content_digest(b"c"))] == ["c.png"]
+    # A blank patient filter is ignored rather than failing
+    assert len(store.query(patient="  ")) == 3
+
+    record = StoredResult(**store.query(bill_no="B-1")[0])
+    assert record.discharge_date == "2024-01-10"
+    assert record.net_amount == 100.0
+    assert record.data.total_item_count == 1
+    assert record.token_usage.total_tokens == 3
+
+
+def test_compact_keeps_latest_per_document(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"), compact_after_seconds=0)
+    digest = content_digest(b"same bill")
+    store.save(digest, make_result("B-1", "Old", "10/01/2024"), USAGE)
+    store.save(digest, make_result("B-1", "New", "10/01/2024"), USAGE)
+    store.save(content_digest(b"other"), make_result("B-9", "Other", "10/01/2024"), USAGE)
+    time.sleep(0.01)
+
+    assert store.compact() == {"removed": 1, "repacked": 2}
+    assert [r["patient_name"] for r in store.query(digest=digest)] == ["New"]
+    assert store.compact() == {"removed": 0, "repacked": 0}
+    assert len(store.query()) == 2
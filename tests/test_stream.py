@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import time
+import asyncio
+
+import httpx
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services.store import ResultStore
+
+ITEM = {"item_name": "Gauze", "item_amount": 30.0, "item_rate": 10.0, "item_quantity": 3.0, "item_category": "pharmacy"}
+USAGE = {"total_tokens": 3, "input_tokens": 2, "output_tokens": 1}
+
+
+def fake_events(content, mime_type, deadline_seconds=None):
+    yield {"event": "summary", "page_count": 2, "metadata": {}, "category_summary": []}
+    yield {"event": "page", "page_no": "2", "bill_items": [ITEM], "token_usage": USAGE}
+    yield {
+        "event": "done",
+        "data": {
+            "pagewise_line_items": [{"page_no": "All", "page_type": "Merged", "bill_items": [ITEM]}],
+            "total_item_count": 1,
+            "reconciled_amount": 30.0,
+        },
+        "token_usage": USAGE,
+    }
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "result_store", ResultStore(str(tmp_path / "results.db")))
+    with TestClient(main.app) as client:
+        yield client
+
+
+def read_events(response):
+    return [json.loads(line) for line in response.iter_lines() if line]
+
+
+def test_file_stream_emits_pages_then_done(client, monkeypatch):
+    monkeypatch.setattr(main, "iter_extraction", fake_events)
+    with client.stream("POST", "/extract-from-file/stream", files={"file": ("bill.pdf", b"%PDF", "application/pdf")}) as response:
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        events = read_events(response)
+
+    assert [e["event"] for e in events] == ["summary", "page", "done"]
+    assert events[1]["bill_items"][0]["item_category"] == "pharmacy"
+    done = events[-1]
+    assert done["is_success"] is True
+    assert done["data"]["total_item_count"] == 1
+    assert done["token_usage"] == USAGE
+    assert done["data"]["pagewise_line_items"][0]["bill_items"][0]["item_category"] == "pharmacy"
+    assert [r["source"] for r in main.result_store.query()] == ["bill.pdf"]
+
+
+def test_stream_reports_failure_as_event(client, monkeypatch):
+    monkeypatch.setattr(main, "iter_extraction", lambda *args: iter(()))
+    with client.stream("POST", "/extract-from-file/stream", files={"file": ("bill.pdf", b"%PDF", "application/pdf")}) as response:
+        events = read_events(response)
+    assert events == [{"event": "error", "detail": "Failed to extract data using Gemini"}]
+
+
+def test_partial_result_is_streamed_but_not_stored(client, monkeypatch):
+    def partial_events(content, mime_type, deadline_seconds=None):
+        for event in fake_events(content, mime_type, deadline_seconds):
+            if event["event"] == "done":
+                event["data"].update(is_partial=True, missing_pages=["1"])
+            yield event
+
+    monkeypatch.setattr(main, "iter_extraction", partial_events)
+    with client.stream("POST", "/extract-from-file/stream", files={"file": ("bill.pdf", b"%PDF", "application/pdf")}) as response:
+        events = read_events(response)
+    assert events[-1]["data"]["missing_pages"] == ["1"]
+    assert main.result_store.query() == []
+
+
+def test_blocking_extraction_does_not_stall_other_requests(client, monkeypatch):
+    def slow_extract(content, mime_type, deadline_seconds=None):
+        time.sleep(0.5)
+        done = list(fake_events(content, mime_type))[-1]
+        return done["data"], done["token_usage"]
+
+    monkeypatch.setattr(main, "extract_with_llm", slow_extract)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            extraction = asyncio.create_task(
+                http.post("/extract-from-file", files={"file": ("bill.pdf", b"%PDF", "application/pdf")})
+            )
+            await asyncio.sleep(0.1)
+            lookup = await http.get("/results")
+            assert lookup.status_code == 200
+            assert not extraction.done()
+            assert (await extraction).status_code == 200
+
+    asyncio.run(scenario())
+
+
+def test_file_endpoint_passes_deadline_through(client, monkeypatch):
+    deadlines = []
+
+    def fake_extract(content, mime_type, deadline_seconds=None):
+        deadlines.append(deadline_seconds)
+        done = list(fake_events(content, mime_type))[-1]
+        return done["data"], done["token_usage"]
+
+    monkeypatch.setattr(main, "extract_with_llm", fake_extract)
+    files = {"file": ("bill.pdf", b"%PDF", "application/pdf")}
+    assert client.post("/extract-from-file?deadline_seconds=30", files=files).status_code == 200
+    assert client.post("/extract-from-file", files=files).status_code == 200
+    assert client.post("/extract-from-file?deadline_seconds=0", files=files).status_code == 422
+    assert deadlines == [30.0, None]